@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+    Memory benchmark for the preferences dictionary built by `quick_settings.load_preferences()`.
+
+    Usage:
+        python3 benchmarks/bench_preferences_memory.py [--packages 40,160] [--settings 50]
+
+    The preferences are loaded from the preferences index, as after restarting Sublime Text, and
+    their size is measured counting each distinct object once. The `dict records` column is the
+    size of the same preferences stored as the `{'value': ..., 'description': ...}` dictionaries
+    with a string object per description, which was the layout before `SettingRecord`.
+"""
+
+import sys
+import shutil
+import argparse
+import tempfile
+
+from bench_quick_settings import sublime
+from bench_quick_settings import quick_settings
+from bench_quick_settings import reset_plugin
+from bench_quick_settings import generate_tree
+
+
+def get_deep_size(value, seen=None):
+    """
+        @return the size in bytes of `value` and all objects it refers to, counting each object once
+    """
+    seen = set() if seen is None else seen
+
+    if id( value ) in seen:
+        return 0
+
+    seen.add( id( value ) )
+    size = sys.getsizeof( value )
+
+    if isinstance( value, dict ):
+        size += sum( get_deep_size( key, seen ) + get_deep_size( item, seen ) for key, item in value.items() )
+
+    elif isinstance( value, ( list, tuple ) ):
+        size += sum( get_deep_size( item, seen ) for item in value )
+
+    return size
+
+
+def copy_string(value):
+    return "".join( list( value ) ) if isinstance( value, str ) else value
+
+
+def as_dict_records(preferences):
+    """
+        @return the preferences with each `SettingRecord` as a dictionary, with its own description string
+    """
+    dict_preferences = {}
+
+    for preference_name, setting_types in preferences.items():
+
+        for setting_type, settings in setting_types.items():
+            dict_settings = dict_preferences.setdefault( preference_name, {} ).setdefault( setting_type, {} )
+
+            for setting_name, setting in settings.items():
+
+                if setting.description is None:
+                    dict_settings[setting_name] = { 'value': setting.value, 'resource': setting.resource, 'span': list( setting.span ) }
+
+                else:
+                    dict_settings[setting_name] = { 'value': setting.value, 'description': copy_string( setting.description ) }
+
+    return dict_preferences
+
+
+def load_indexed_preferences(packages_path, lazy_descriptions):
+    # Build the preferences index, then load the preferences from it
+    reset_plugin( packages_path, quick_settings_lazy_descriptions=lazy_descriptions )
+    quick_settings.load_preferences()
+    sublime.run_timeouts()
+
+    reset_plugin( packages_path, quick_settings_lazy_descriptions=lazy_descriptions )
+    return quick_settings.load_preferences()
+
+
+def main():
+    argumentsParser = argparse.ArgumentParser( description="Measure the memory used by the preferences dictionary" )
+    argumentsParser.add_argument( "--packages", default="40,160", help="Comma separated numbers of packages" )
+    argumentsParser.add_argument( "--settings", type=int, default=50, help="How many settings each package has" )
+    arguments = argumentsParser.parse_args()
+
+    quick_settings.log.debug_level = 1
+    print( "%8s %8s  %-6s %18s %18s %8s" % ( "packages", "settings", "lazy", "dict records KB", "SettingRecord KB", "ratio" ) )
+
+    for packages_count in [ int( count ) for count in arguments.packages.split( ',' ) ]:
+        root = tempfile.mkdtemp( prefix="quick_settings_benchmark_" )
+
+        try:
+            packages_path = generate_tree( root, packages_count, arguments.settings )
+
+            for lazy_descriptions in ( False, True ):
+                preferences = load_indexed_preferences( packages_path, lazy_descriptions )
+
+                records_size = get_deep_size( preferences )
+                dict_records_size = get_deep_size( as_dict_records( preferences ) )
+
+                print( "%8d %8d  %-6s %18.1f %18.1f %8.2f" % ( packages_count, arguments.settings, lazy_descriptions,
+                        dict_records_size / 1024, records_size / 1024, records_size / dict_records_size ) )
+
+        finally:
+            quick_settings.plugin_unloaded()
+            sublime.run_timeouts()
+            shutil.rmtree( root )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+    Offline benchmark for `quick_settings`, running it against the `benchmarks/stubs` stand-ins of
+    the `sublime` and `sublime_plugin` modules and synthetic `Packages` trees.
+
+    Usage:
+        python3 benchmarks/bench_quick_settings.py [--packages 10,40,160] [--settings 50] [--repeat 3]
+
+    For each size, a tree with N packages, each one with a settings file with M settings and a
+    syntax, is generated and every phase is timed. The `peak KB` column is the memory peak traced
+    by `tracemalloc` on a separate run of the phase. It requires the `debug_tools` dependency.
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import importlib
+import tracemalloc
+
+BENCHMARKS_DIRECTORY = os.path.dirname( os.path.abspath( __file__ ) )
+PACKAGE_DIRECTORY = os.path.dirname( BENCHMARKS_DIRECTORY )
+
+sys.path.insert( 0, os.path.join( BENCHMARKS_DIRECTORY, "stubs" ) )
+sys.path.insert( 0, os.path.dirname( PACKAGE_DIRECTORY ) )
+
+import sublime
+
+# The plugin uses relative imports, then it is imported as a submodule of its package directory
+quick_settings = importlib.import_module( os.path.basename( PACKAGE_DIRECTORY ) + ".quick_settings" )
+
+
+VALUES = \
+(
+    'true',
+    '4',
+    '2.5',
+    '"a string with \\"quotes\\" and // slashes"',
+    '[ "list", 1, false ]',
+    '{ "nested": { "list": [ null, 1 ] } }',
+)
+
+
+def write_settings_file(file_path, settings_count, prefix):
+    """
+        Write a settings file where most settings have one to three lines of comments, some have
+        a block comment and a few have none, as the settings files of the packages usually are.
+    """
+    lines = [ "{" ]
+
+    for index in range( settings_count ):
+        comment_lines = random.choice( ( 0, 1, 2, 2, 3 ) )
+
+        if random.random() < 0.1:
+            lines.append( "    /* Setting %d of %s," % ( index, prefix ) )
+            lines.append( "       described on a block comment. */" )
+
+        for line in range( comment_lines ):
+            lines.append( "    // Line %d of the description of the setting %d, with some \"quoted\" words." % ( line, index ) )
+
+        lines.append( '    "%s_%d": %s,' % ( prefix, index, random.choice( VALUES ) ) )
+        lines.append( "" )
+
+    lines.append( "}" )
+
+    with open( file_path, 'w', encoding='utf-8' ) as settings_file:
+        settings_file.write( "\n".join( lines ) )
+
+
+def generate_tree(root, packages_count, settings_count):
+    random.seed( 1 )
+    packages_path = os.path.join( root, "Packages" )
+
+    for package_index in range( packages_count ):
+        package_name = "Package%03d" % package_index
+        package_path = os.path.join( packages_path, package_name )
+
+        os.makedirs( package_path )
+        write_settings_file( os.path.join( package_path, package_name + ".sublime-settings" ), settings_count, "setting" )
+
+        with open( os.path.join( package_path, "Syntax%03d.sublime-syntax" % package_index ), 'w' ) as syntax_file:
+            syntax_file.write( "%%YAML 1.2\n---\nscope: source.syntax%03d\n" % package_index )
+
+    os.makedirs( os.path.join( packages_path, "Default" ) )
+    os.makedirs( os.path.join( packages_path, "User" ) )
+
+    write_settings_file( os.path.join( packages_path, "Default", "Preferences.sublime-settings" ), settings_count, "preference" )
+    write_settings_file( os.path.join( packages_path, "Default", "Preferences (Linux).sublime-settings" ), 5, "preference" )
+    write_settings_file( os.path.join( packages_path, "User", "Preferences.sublime-settings" ), 5, "preference" )
+
+    with open( os.path.join( packages_path, "User", quick_settings.CURRENT_PACKAGE_NAME + ".inputs" ), 'w' ) as inputs_file:
+        inputs_file.write( "{}" )
+
+    return packages_path
+
+
+def reset_plugin(packages_path, **preferences):
+    """
+        Load the plugin as if Sublime Text was just started with `packages_path`.
+
+        @preferences   the settings to set on `Preferences.sublime-settings`
+    """
+    sublime.set_packages_path( packages_path )
+    sublime.load_settings( "Preferences.sublime-settings" ).set( "quick_settings_warm_up", False )
+
+    for setting_name, value in preferences.items():
+        sublime.load_settings( "Preferences.sublime-settings" ).set( setting_name, value )
+
+    quick_settings.g_preferences_index = None
+    quick_settings.g_option_values.clear()
+    quick_settings.g_resource_listings.clear()
+    quick_settings.invalidate_preferences()
+    quick_settings.plugin_loaded()
+    sublime.run_timeouts()
+
+
+def cold_load_preferences(packages_path):
+    index_path = os.path.join( packages_path, "User", quick_settings.CURRENT_PACKAGE_NAME + ".index" )
+
+    if os.path.exists( index_path ):
+        os.remove( index_path )
+
+    reset_plugin( packages_path )
+    return lambda: quick_settings.load_preferences()
+
+
+def warm_load_preferences(packages_path):
+    reset_plugin( packages_path )
+    quick_settings.load_preferences()
+    sublime.run_timeouts()
+
+    reset_plugin( packages_path )
+    return lambda: quick_settings.load_preferences()
+
+
+def parse_all_settings(packages_path):
+    reset_plugin( packages_path )
+    preferences_data = [ sublime.load_resource( resource ) for resource in sublime.find_resources( "*.sublime-settings" ) ]
+
+    def run():
+
+        for preference_data in preferences_data:
+            quick_settings.parse_settings( preference_data )
+
+    return run
+
+
+def load_syntax_names(packages_path):
+    reset_plugin( packages_path )
+    return lambda: quick_settings.load_syntax_names()
+
+
+def build_file_panel(packages_path):
+    reset_plugin( packages_path )
+    quick_settings.load_preferences()
+
+    command = quick_settings.QuickSettingsEditPreferencesCommand( sublime.active_window() )
+    return lambda: command.run( setting_file="Package000" )
+
+
+def build_main_panel(packages_path):
+    reset_plugin( packages_path )
+    quick_settings.load_preferences()
+
+    command = quick_settings.QuickSettingsEditPreferencesCommand( sublime.active_window() )
+    return lambda: command.run()
+
+
+def save_index(packages_path):
+    reset_plugin( packages_path )
+
+    def run():
+
+        for index in range( 200 ):
+            quick_settings.save_index( "Package%03d" % ( index % 20 ), index )
+
+        quick_settings.flush_indexes()
+
+    return run
+
+
+PHASES = \
+(
+    ( "load_preferences (cold)", cold_load_preferences ),
+    ( "load_preferences (warm)", warm_load_preferences ),
+    ( "parse_settings", parse_all_settings ),
+    ( "load_syntax_names", load_syntax_names ),
+    ( "run (file panel)", build_file_panel ),
+    ( "run (main panel)", build_main_panel ),
+    ( "save_index x200", save_index ),
+)
+
+
+def measure(setup, packages_path, repeat):
+    """
+        @setup   a function which prepares the phase and returns the function to be measured
+
+        @return the best time of `repeat` runs and the memory peak of one more run in KB
+    """
+    best = None
+
+    for _ in range( repeat ):
+        run = setup( packages_path )
+        start = time.perf_counter()
+        run()
+
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min( best, elapsed )
+        sublime.run_timeouts()
+
+    run = setup( packages_path )
+    tracemalloc.start()
+
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+
+    finally:
+        tracemalloc.stop()
+
+    sublime.run_timeouts()
+    return best, peak / 1024
+
+
+def main():
+    argumentsParser = argparse.ArgumentParser( description="Benchmark Quick Settings against synthetic package trees" )
+    argumentsParser.add_argument( "--packages", default="10,40,160", help="Comma separated numbers of packages" )
+    argumentsParser.add_argument( "--settings", type=int, default=50, help="How many settings each package has" )
+    argumentsParser.add_argument( "--repeat", type=int, default=3, help="How many times to run each phase" )
+    arguments = argumentsParser.parse_args()
+
+    quick_settings.log.debug_level = 1
+    print( "%8s %8s  %-24s %12s %12s" % ( "packages", "settings", "phase", "seconds", "peak KB" ) )
+
+    for packages_count in [ int( count ) for count in arguments.packages.split( ',' ) ]:
+        root = tempfile.mkdtemp( prefix="quick_settings_benchmark_" )
+
+        try:
+            packages_path = generate_tree( root, packages_count, arguments.settings )
+
+            for name, setup in PHASES:
+                elapsed, peak = measure( setup, packages_path, arguments.repeat )
+                print( "%8d %8d  %-24s %12.5f %12.1f" % ( packages_count, arguments.settings, name, elapsed, peak ) )
+
+        finally:
+            quick_settings.plugin_unloaded()
+            sublime.run_timeouts()
+            shutil.rmtree( root )
+
+
+if __name__ == "__main__":
+    main()
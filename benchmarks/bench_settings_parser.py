@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+    Adversarial input benchmark for `settings_parser.parse_settings()`.
+
+    Usage:
+        python3 benchmarks/bench_settings_parser.py [--repeat 3] [--steps 5]
+
+    Each input shape is parsed with its size doubled on every step. The `ratio` column is the time
+    of the current step divided by the time of the previous one, and it stays close to 2 when the
+    parser scales linearly with the input size.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+from settings_parser import parse_settings
+
+
+def many_settings(count):
+    lines = [ "{" ]
+
+    for index in range( count ):
+        lines.append( '    // Setting number %d, with "quotes" and // slashes inside.' % index )
+        lines.append( '    // It also has a second line.' )
+        lines.append( '    "setting_%d": [ "value", %d, true, { "nested": null } ],' % ( index, index ) )
+        lines.append( '' )
+
+    lines.append( "}" )
+    return "\n".join( lines )
+
+
+def quoted_line(count):
+    values = ', '.join( [ r'"a \"quoted\" // value"' ] * count )
+    return '{\n    "setting": [ %s ], // trailing comment\n}' % values
+
+
+def comment_quotes(count):
+    comment = '    // "a" "b" // "c \\" "d" // "e"\n' * count
+    return '{\n%s    "setting": 1,\n}' % comment
+
+
+def escaped_string(count):
+    return '{\n    "setting": "%s",\n}' % ( r'\"' * count )
+
+
+def block_comments(count):
+    comment = '    /* * ** *** "x" // y\n       ** * */\n' * count
+    return '{\n%s    "setting": 1,\n}' % comment
+
+
+def nested_values(count):
+    value = '{ "a": [ [ { "b": [ 1, 2, 3 ] } ] ] }'
+    values = '\n'.join( [ '        %s, // nested comment' % value ] * count )
+    return '{\n    "setting":\n    [\n%s\n    ],\n}' % values
+
+
+SHAPES = \
+(
+    ( "many_settings", many_settings, 250 ),
+    ( "quoted_line", quoted_line, 2000 ),
+    ( "comment_quotes", comment_quotes, 1500 ),
+    ( "escaped_string", escaped_string, 25000 ),
+    ( "block_comments", block_comments, 1200 ),
+    ( "nested_values", nested_values, 1000 ),
+)
+
+
+def measure(data, repeat):
+    best = None
+
+    for _ in range( repeat ):
+        start = time.perf_counter()
+        parse_settings( data )
+
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min( best, elapsed )
+
+    return best
+
+
+def main():
+    argumentsParser = argparse.ArgumentParser( description="Benchmark the settings parser with adversarial inputs" )
+    argumentsParser.add_argument( "--repeat", type=int, default=3, help="How many times to parse each input" )
+    argumentsParser.add_argument( "--steps", type=int, default=5, help="How many times to double each input" )
+    arguments = argumentsParser.parse_args()
+
+    print( "%-16s %12s %12s %12s %8s" % ( "shape", "bytes", "seconds", "MB/s", "ratio" ) )
+
+    for name, generator, count in SHAPES:
+        last_elapsed = None
+
+        for step in range( arguments.steps ):
+            data = generator( count << step )
+            elapsed = measure( data, arguments.repeat )
+
+            ratio = "%.2f" % ( elapsed / last_elapsed ) if last_elapsed else "-"
+            last_elapsed = elapsed
+
+            print( "%-16s %12d %12.5f %12.2f %8s" % ( name, len( data ), elapsed, len( data ) / elapsed / 1e6, ratio ) )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+    In-process stand-in for the Sublime Text `sublime` module, just enough to run `quick_settings`
+    outside the editor. The resources are served from a `Packages` directory on the disk, set with
+    `set_packages_path()`, and the timeouts are queued until `run_timeouts()` is called.
+"""
+
+import os
+import json
+import fnmatch
+
+
+KEEP_OPEN_ON_FOCUS_LOST = 2
+
+g_packages_path = None
+g_resources = []
+g_timeouts = []
+g_settings = {}
+
+
+def set_packages_path(packages_path):
+    """
+        Serve the resources from `packages_path`, indexing them once as Sublime Text does.
+    """
+    global g_packages_path
+    global g_resources
+
+    g_packages_path = packages_path
+    g_resources = []
+
+    for directory, directories, files in os.walk( packages_path ):
+        directories.sort()
+
+        for file_name in sorted( files ):
+            resource = os.path.relpath( os.path.join( directory, file_name ), packages_path )
+            g_resources.append( "Packages/" + resource.replace( os.sep, "/" ) )
+
+    g_settings.clear()
+
+
+def run_timeouts():
+    """
+        Run the queued `set_timeout()` and `set_timeout_async()` callbacks, including the ones they queue.
+    """
+
+    while g_timeouts:
+        g_timeouts.pop( 0 )()
+
+
+def version():
+    return "3211"
+
+
+def platform():
+    return "linux"
+
+
+def packages_path():
+    return g_packages_path
+
+
+def installed_packages_path():
+    return os.path.join( os.path.dirname( g_packages_path ), "Installed Packages" )
+
+
+def find_resources(pattern):
+    return [ resource for resource in g_resources if fnmatch.fnmatch( resource.rsplit( '/', 1 )[-1], pattern ) ]
+
+
+def _resource_path(resource):
+    return os.path.join( g_packages_path, *resource.split( '/' )[1:] )
+
+
+def load_resource(resource):
+
+    with open( _resource_path( resource ), 'r', encoding='utf-8', newline='' ) as resource_file:
+        return resource_file.read()
+
+
+def load_binary_resource(resource):
+
+    with open( _resource_path( resource ), 'rb' ) as resource_file:
+        return resource_file.read()
+
+
+def decode_value(data):
+    return json.loads( data )
+
+
+def encode_value(value, pretty=False):
+    return json.dumps( value, indent=4 if pretty else None )
+
+
+def load_settings(base_name):
+    return g_settings.setdefault( base_name, Settings() )
+
+
+def save_settings(base_name):
+    pass
+
+
+def set_timeout(callback, delay=0):
+    g_timeouts.append( callback )
+
+
+def set_timeout_async(callback, delay=0):
+    g_timeouts.append( callback )
+
+
+def status_message(message):
+    pass
+
+
+def error_message(message):
+    pass
+
+
+def active_window():
+    return g_window
+
+
+def windows():
+    return [ g_window ]
+
+
+class Region():
+
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+
+class Settings(dict):
+
+    def __init__(self):
+        super().__init__()
+        self.callbacks = {}
+
+    def set(self, key, value):
+        self[key] = value
+
+    def has(self, key):
+        return key in self
+
+    def erase(self, key):
+        self.pop( key, None )
+
+    def add_on_change(self, key, callback):
+        self.callbacks[key] = callback
+
+    def clear_on_change(self, key):
+        self.callbacks.pop( key, None )
+
+
+class View():
+
+    def __init__(self, window):
+        self._window   = window
+        self._settings = Settings()
+
+    def id(self):
+        return id( self )
+
+    def window(self):
+        return self._window
+
+    def settings(self):
+        return self._settings
+
+    def file_name(self):
+        return None
+
+    def size(self):
+        return 0
+
+    def run_command(self, command, args=None):
+        pass
+
+    def show(self, position):
+        pass
+
+    def set_status(self, key, value):
+        pass
+
+    def erase_status(self, key):
+        pass
+
+    def set_scratch(self, is_scratch):
+        pass
+
+
+class Window():
+
+    def __init__(self):
+        self.view          = View( self )
+        self.quick_panels  = []
+        self._settings     = Settings()
+        self._project_data = {}
+
+    def id(self):
+        return 1
+
+    def active_view(self):
+        return self.view
+
+    def settings(self):
+        return self._settings
+
+    def project_file_name(self):
+        return None
+
+    def project_data(self):
+        return json.loads( json.dumps( self._project_data ) )
+
+    def set_project_data(self, project_data):
+        self._project_data = project_data
+
+    def create_output_panel(self, name):
+        return View( self )
+
+    def run_command(self, command, args=None):
+        pass
+
+    def show_quick_panel(self, items, on_done, flags=0, selected_index=-1, on_highlight=None):
+        self.quick_panels.append( items )
+
+    def show_input_panel(self, caption, initial_text, on_done, on_change, on_cancel):
+        return View( self )
+
+
+g_window = Window()
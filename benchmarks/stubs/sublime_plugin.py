@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+    In-process stand-in for the Sublime Text `sublime_plugin` module.
+"""
+
+
+class EventListener():
+    pass
+
+
+class ApplicationCommand():
+    pass
+
+
+class WindowCommand():
+
+    def __init__(self, window):
+        self.window = window
+
+
+class TextCommand():
+
+    def __init__(self, view):
+        self.view = view
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import json
+import fnmatch
+import argparse
+import multiprocessing
+import concurrent.futures
+
+from collections import namedtuple
+
+try:
+    from .settings_parser import parse_settings
+    from .settings_parser import NO_HELP_AVAILABLE
+
+except ( ImportError, SystemError, ValueError ):
+    from settings_parser import parse_settings
+    from settings_parser import NO_HELP_AVAILABLE
+
+
+# Resolution of the settings files into their effective values, without the `sublime` module, so it
+# can run on the plugin and on the command line over a plain directory of packages. Usage:
+#
+#     python3 preferences_engine.py "~/.config/sublime-text-3/Packages" --syntax Python --project my.sublime-project
+
+DEFAULT_PREFERENCES_FILE = 'Preferences'
+SYNTAX_TYPES = ( "*.tmLanguage", "*.sublime-syntax" )
+
+PLATFORMS = \
+{
+    "darwin": "osx",
+    "win32": "windows",
+}
+
+
+class SettingRecord(namedtuple( 'SettingRecord', 'value description resource span' )):
+    """
+        A setting of the preferences dictionary. It is immutable, so the same record can be shared
+        by all windows, and its description is None when it is loaded lazily from the `(start, end)`
+        position `span` of its comments on `resource`.
+    """
+    __slots__ = ()
+
+    def __new__(cls, value=None, description=NO_HELP_AVAILABLE, resource=None, span=None):
+        return super( SettingRecord, cls ).__new__( cls, value, description, resource, span )
+
+
+def intern_value(value):
+    """
+        Share the strings repeated across the settings files, as the same paths and descriptions
+        on the default, platform and user variants of each file.
+    """
+    return sys.intern( value ) if isinstance( value, str ) else value
+
+
+def get_preference_name(file):
+    return os.path.basename(file).rsplit('.', 1)[0]
+
+
+def get_preference_location(preference_file):
+    """
+        @preference_file   the resource path as `Packages/Default/Preferences (Linux).sublime-settings`
+
+        @return a tuple with the preference name and the setting type where the resource settings
+                are stored on the preferences dictionary, i.e., ('Preferences', 'default_linux')
+    """
+    preference_name = get_preference_name(preference_file)
+    platform = "any"
+
+    if preference_name[-5:].lower() == "(osx)":
+        preference_name = preference_name[:-6]
+        platform = "osx"
+
+    elif preference_name[-9:].lower() == "(windows)":
+        preference_name = preference_name[:-10]
+        platform = "windows"
+
+    elif preference_name[-7:].lower() == "(linux)":
+        preference_name = preference_name[:-8]
+        platform = "linux"
+
+    if preference_name == "Base File":
+        preference_name = DEFAULT_PREFERENCES_FILE
+
+    if preference_name == "Global":
+        preference_name = DEFAULT_PREFERENCES_FILE
+
+    if "/User/" in preference_file:
+        setting_type = "user"
+
+    else:
+        setting_type = "default"
+
+    if platform != "any":
+        setting_type = setting_type+"_"+platform
+
+    return preference_name, setting_type
+
+
+def get_setting_types(platform):
+    """
+        @return the setting types of the preferences dictionary from the lowest to the highest priority
+    """
+    return ( "default", "default_%s" % platform, "user", "user_%s" % platform )
+
+
+def merge_preferences(preferences_files, get_settings):
+    """
+        @preferences_files   the settings resources on the Sublime Text loading order
+        @get_settings        a function returning the setting records of a resource
+
+        @return the preferences dictionary as `preferences[name][setting_type][setting_name]`,
+                where later resources override the earlier ones
+    """
+    preferences = {}
+
+    for preference_file in preferences_files:
+        preference_name, setting_type = get_preference_location(preference_file)
+
+        preference = preferences.setdefault( preference_name, {} ).setdefault( setting_type, {} )
+        preference.update( get_settings( preference_file ) )
+
+    return preferences
+
+
+def create_resolver(preferences, setting_file, platform, is_preferences=False):
+    """
+        @is_preferences   whether `setting_file` inherits the settings of the `Preferences` file, as
+                          the syntax settings files do
+
+        @return a `SettingsResolver` with the default and user layers of `setting_file`
+    """
+    resolver = SettingsResolver()
+    setting_files = [ setting_file ]
+
+    if is_preferences:
+        setting_files.insert( 0, DEFAULT_PREFERENCES_FILE )
+
+    for setting_name in setting_files:
+        setting = preferences.get( setting_name, {} )
+
+        for setting_type in get_setting_types( platform ):
+
+            if setting_type in setting:
+                resolver.add_layer( setting_name + '/' + setting_type, setting[setting_type] )
+
+    return resolver
+
+
+class SettingsResolver():
+    """
+        Merge the layers of a settings file once, from the lowest to the highest priority, i.e.,
+        default, platform default, user, platform user, project and view, so the effective value
+        of any setting and the layer it came from are found by a single dictionary lookup.
+    """
+
+    def __init__(self):
+        self.settings   = {}
+        self.values     = {}
+        self.provenance = {}
+
+        self.values_provenance = {}
+        self.view_settings   = None
+        self.view_provenance = None
+
+    def add_layer(self, provenance, settings):
+        """
+            @settings   a dictionary with the `SettingRecord` of each setting name
+        """
+        self.settings.update( settings )
+        self.provenance.update( dict.fromkeys( settings, provenance ) )
+
+    def add_values(self, provenance, values):
+        """
+            Override the values of the settings already on the lower layers, as the project settings.
+        """
+        values = { setting_name: value for setting_name, value in values.items() if setting_name in self.settings }
+
+        self.values.update( values )
+        self.values_provenance.update( dict.fromkeys( values, provenance ) )
+
+    def set_view_settings(self, provenance, view_settings):
+        """
+            The view settings cannot be listed, then they are only read when a setting is looked up.
+        """
+        self.view_settings   = view_settings
+        self.view_provenance = provenance
+
+    def create_overlay(self):
+        """
+            @return a resolver sharing the default and user layers of this one, where the values and
+                    view settings of a single session can be set without changing this resolver
+        """
+        overlay = SettingsResolver()
+        overlay.settings   = self.settings
+        overlay.provenance = self.provenance
+
+        overlay.values = dict( self.values )
+        overlay.values_provenance = dict( self.values_provenance )
+
+        overlay.view_settings   = self.view_settings
+        overlay.view_provenance = self.view_provenance
+        return overlay
+
+    def get(self, setting_name):
+        """
+            @return the `SettingRecord` with the effective value
+        """
+        setting = self.settings.get( setting_name )
+
+        if setting is None:
+            return SettingRecord()
+
+        if self.view_settings is not None:
+            return setting._replace( value=self.view_settings.get( setting_name ) )
+
+        if setting_name in self.values:
+            return setting._replace( value=self.values[setting_name] )
+
+        return setting
+
+    def get_provenance(self, setting_name):
+        """
+            @return the layer the effective value comes from, as `Preferences/user`, or None
+        """
+
+        if self.view_settings is not None and setting_name in self.settings:
+            return self.view_provenance
+
+        if setting_name in self.values_provenance:
+            return self.values_provenance[setting_name]
+
+        return self.provenance.get( setting_name )
+
+
+class DirectoryResources():
+    """
+        Serve the resources of a `Packages` directory as `sublime.find_resources()` does, with the
+        `Default` package first and the `User` package last. The `.sublime-package` archives are
+        not read.
+    """
+
+    def __init__(self, packages_path):
+        self.packages_path = packages_path
+        self.resources = []
+
+        packages = sorted( os.listdir( packages_path ), key=lambda package: (
+                package != "Default", package == "User", package.lower() ) )
+
+        for package in packages:
+            package_path = os.path.join( packages_path, package )
+
+            for directory, directories, files in os.walk( package_path ):
+                directories.sort( key=str.lower )
+
+                for file_name in sorted( files, key=str.lower ):
+                    resource = os.path.relpath( os.path.join( directory, file_name ), packages_path )
+                    self.resources.append( "Packages/" + resource.replace( os.sep, "/" ) )
+
+    def find_resources(self, pattern):
+        return [ resource for resource in self.resources if fnmatch.fnmatch( resource.rsplit( '/', 1 )[-1], pattern ) ]
+
+    def load_resource(self, resource):
+        resource_path = os.path.join( self.packages_path, *resource.split( '/' )[1:] )
+
+        with open( resource_path, 'r', encoding='utf-8', newline='' ) as resource_file:
+            return resource_file.read()
+
+
+def load_preferences(resources, errors=None):
+    """
+        @resources   an object with the `find_resources()` and `load_resource()` methods
+        @errors      a list where the `[resource, message]` of the invalid files are appended
+
+        @return the preferences dictionary with the setting records of all settings files
+    """
+
+    def get_settings(preference_file):
+
+        try:
+            settings = parse_settings( resources.load_resource( preference_file ) )
+
+        except ( OSError, ValueError ) as error:
+
+            if errors is not None:
+                errors.append( [ preference_file, str( error ) ] )
+
+            return {}
+
+        return { setting_name: SettingRecord( intern_value( value ), intern_value( description ) )
+                for setting_name, ( value, description ) in settings.items() }
+
+    return merge_preferences( resources.find_resources( "*.sublime-settings" ), get_settings )
+
+
+def load_syntax_names(resources):
+    return [ get_preference_name( syntax ) for syntax_type in SYNTAX_TYPES for syntax in resources.find_resources( syntax_type ) ]
+
+
+def get_effective_settings(preferences, platform, syntax=None, project_settings=None):
+    """
+        @return a dictionary with the effective value of each setting, layered as Sublime Text does,
+                i.e., preferences, project settings and then the syntax settings. The `meta.*`
+                settings only describe the widgets of the other settings, then they are skipped.
+    """
+    effective_settings = {}
+
+    def add_layers(setting_file):
+        setting = preferences.get( setting_file, {} )
+
+        for setting_type in get_setting_types( platform ):
+
+            for setting_name, record in setting.get( setting_type, {} ).items():
+
+                if not setting_name.startswith( 'meta.' ):
+                    effective_settings[setting_name] = record.value
+
+    add_layers( DEFAULT_PREFERENCES_FILE )
+
+    if project_settings:
+        effective_settings.update( ( setting_name, value ) for setting_name, value in project_settings.items() if not setting_name.startswith( 'meta.' ) )
+
+    if syntax:
+        add_layers( syntax )
+
+    return effective_settings
+
+
+def load_project_settings(project_file):
+    """
+        @return the `settings` dictionary of a `.sublime-project` file
+    """
+
+    with open( project_file, 'r', encoding='utf-8' ) as project:
+        project_data = parse_settings( project.read() )
+
+    return project_data.get( 'settings', [{}] )[0] or {}
+
+
+def dump_effective_settings(packages_path, platform, syntaxes=(), project_files=(), all_syntaxes=False):
+    """
+        @return a dictionary with the effective settings of `Preferences`, of each syntax and of
+                each project file for the packages directory
+    """
+    errors = []
+    resources = DirectoryResources( packages_path )
+    preferences = load_preferences( resources, errors )
+
+    if all_syntaxes:
+        syntaxes = sorted( set( load_syntax_names( resources ) ) )
+
+    def dump(project_settings=None):
+        return \
+        {
+            DEFAULT_PREFERENCES_FILE: get_effective_settings( preferences, platform, project_settings=project_settings ),
+            "syntaxes": { syntax: get_effective_settings( preferences, platform, syntax, project_settings ) for syntax in syntaxes },
+        }
+
+    effective_settings = dump()
+    effective_settings["projects"] = {}
+
+    for project_file in project_files:
+
+        try:
+            effective_settings["projects"][project_file] = dump( load_project_settings( project_file ) )
+
+        except ( OSError, ValueError ) as error:
+            errors.append( [ project_file, str( error ) ] )
+
+    effective_settings["errors"] = errors
+    return effective_settings
+
+
+def main():
+    argumentsParser = argparse.ArgumentParser( description="Dump the effective Sublime Text settings of packages directories" )
+    argumentsParser.add_argument( "packages_paths", nargs='+', help="The Packages directories, e.g., one for each machine" )
+    argumentsParser.add_argument( "--syntax", action='append', default=[], help="A syntax name to dump the settings of" )
+    argumentsParser.add_argument( "--all-syntaxes", action='store_true', help="Dump the settings of all syntaxes found" )
+    argumentsParser.add_argument( "--project", action='append', default=[], help="A .sublime-project file to dump the settings of" )
+    argumentsParser.add_argument( "--platform", default=PLATFORMS.get( sys.platform, "linux" ), choices=( "linux", "osx", "windows" ) )
+    argumentsParser.add_argument( "--workers", type=int, default=0, help="How many processes to use, 0 for one per processor" )
+    argumentsParser.add_argument( "--output", help="The JSON file to write, instead of the standard output" )
+    arguments = argumentsParser.parse_args()
+
+    workers = arguments.workers if arguments.workers > 0 else multiprocessing.cpu_count()
+    workers = min( workers, len( arguments.packages_paths ) )
+
+    dump_arguments = ( arguments.platform, arguments.syntax, arguments.project, arguments.all_syntaxes )
+    effective_settings = {}
+
+    if workers < 2:
+
+        for packages_path in arguments.packages_paths:
+            effective_settings[packages_path] = dump_effective_settings( packages_path, *dump_arguments )
+
+    else:
+
+        with concurrent.futures.ProcessPoolExecutor( workers ) as executor:
+            futures = [ ( packages_path, executor.submit( dump_effective_settings, packages_path, *dump_arguments ) )
+                    for packages_path in arguments.packages_paths ]
+
+            for packages_path, future in futures:
+                effective_settings[packages_path] = future.result()
+
+    if arguments.output:
+
+        with open( arguments.output, 'w', encoding='utf-8' ) as output_file:
+            json.dump( effective_settings, output_file, indent=4, sort_keys=True )
+
+    else:
+        json.dump( effective_settings, sys.stdout, indent=4, sort_keys=True )
+        sys.stdout.write( "\n" )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,28 @@
 #!/usr/bin/env python3
 # -*- coding: UTF-8 -*-
 
+import io
 import os
 import re
 import sys
+import time
 
 import pprint
+import threading
 
 import sublime
 import sublime_plugin
 
 import ast
+import copy
 import json
+import bisect
+import fnmatch
+import hashlib
+import importlib
 
+from collections import deque
+from collections import ChainMap
 from collections import OrderedDict
 
 # # Import the debugger
@@ -21,6 +31,17 @@ from debug_tools.third_part import load_data_file
 from debug_tools.third_part import write_data_file
 from debug_tools.utilities import pop_dict_last_item
 
+from .settings_parser import parse_settings
+from .settings_parser import format_description
+
+from .preferences_engine import SettingRecord
+from .preferences_engine import intern_value
+from .preferences_engine import merge_preferences
+from .preferences_engine import create_resolver
+from .preferences_engine import get_preference_name
+from .preferences_engine import SYNTAX_TYPES
+from .preferences_engine import get_preference_location
+
 # Enable debug messages: (bitwise)
 #
 # 0   - Disabled debugging
@@ -56,19 +77,158 @@ PACKAGE_ROOT_DIRECTORY = CURRENT_PACKAGE_FILE.replace( ".sublime-package", "" )
 CURRENT_PACKAGE_NAME   = os.path.basename( PACKAGE_ROOT_DIRECTORY )
 
 g_settings = {}
+g_inputs_lock = threading.RLock()
+
+# The indexes not written to the inputs journal yet, indexed by `(project_file_name, key)`
+g_pending_indexes = OrderedDict()
+g_flush_indexes_id = 0
+
+# The inputs journal writes of the current panel session, see `start_inputs_session()`
+g_inputs_writes = 0
+g_inputs_selections = 0
+g_inputs_journal_entries = 0
 main_function_key = 'main_function'
 last_quick_settings_input = 'last_quick_settings_input'
 
 MAXIMUM_WORSPACES_ENTRIES = 100
+MAXIMUM_JOURNAL_ENTRIES = 100
+INPUTS_FLUSH_DELAY = 2000
+MAXIMUM_DESCRIPTIONS_ENTRIES = 100
+
+# Bump it whenever the layout of the preferences index file changes
+PREFERENCES_INDEX_VERSION = 2
+
+# Cache of the parsed `*.sublime-settings` resources, indexed by the resource path
+g_preferences_index = None
+
+# The preferences dictionary snapshot built by `load_preferences()`, shared by all windows
+g_preferences = None
+g_preferences_lock = threading.RLock()
+
+# Incremented whenever the preferences dictionary changes
+g_preferences_version = 0
+
+# The resolvers and setting names computed from the current preferences snapshot, see `get_shared_value()`
+g_shared_values = {}
+g_shared_values_version = None
+g_search_index = None
+
+# The remaining steps of the preferences scan started by `warm_up_preferences()`
+g_warm_up_steps = None
+WARM_UP_DELAY = 1000
+
+# Which resources are merged into each `preferences[name][setting_type]` dictionary
+g_preferences_locations = {}
+
+# The modification time of the loaded resources which are files, or None for the packed ones
+g_preferences_mtimes = {}
+
+# The `settings` of each window project data, indexed by the window id
+g_project_settings = {}
+g_ignored_packages = None
+g_lazy_descriptions = None
+
+# The last value and its JSON text shown on each panel row, indexed by `(setting_file, setting_name)`
+g_option_values = {}
+SCALAR_TYPES = ( str, int, float, bool, type( None ) )
+
+# The recently shown lazy descriptions, indexed by `(resource, start, end)`
+g_descriptions = OrderedDict()
+g_descriptions_resource = [None, None]
+
+# How many milliseconds each preview cost class waits the user to stop on a value before applying it
+PREVIEW_DWELL_TIMES = \
+{
+    "cheap": 0,
+    "moderate": 100,
+    "expensive": 300,
+}
+
+# How many milliseconds the help view waits the highlights to stop before showing the description
+HELP_VIEW_DELAY = 50
+
+# The sorted resources and their quick panel rows, indexed by the `find_resources()` pattern
+g_resource_listings = {}
+g_installed_packages = None
+
+# How many of the last durations of each phase are kept by `PerformanceStats`
+MAXIMUM_PERFORMANCE_SAMPLES = 1000
+g_log_performance = False
+
+# The profiler of the session armed by the `quick_settings_profile_next_session` command
+g_profiler = None
+g_is_profiler_armed = False
+PROFILE_SUMMARY_LINES = 50
 
 def plugin_loaded():
+    global g_log_performance
+    global g_ignored_packages
+    global g_installed_packages
+    global g_lazy_descriptions
     load_settings()
 
+    preferences = sublime.load_settings( "Preferences.sublime-settings" )
+    g_ignored_packages = preferences.get( "ignored_packages", [] )
+    g_lazy_descriptions = preferences.get( "quick_settings_lazy_descriptions", True )
+    g_log_performance = preferences.get( "quick_settings_log_performance", False )
+    preferences.add_on_change( CURRENT_PACKAGE_NAME, on_preferences_changed )
+
+    package_control = sublime.load_settings( "Package Control.sublime-settings" )
+    g_installed_packages = package_control.get( "installed_packages", [] )
+    package_control.add_on_change( CURRENT_PACKAGE_NAME, on_package_control_changed )
+
+    if preferences.get( "quick_settings_warm_up", True ):
+        sublime.set_timeout_async( warm_up_preferences, WARM_UP_DELAY )
+
+def plugin_unloaded():
+    sublime.load_settings( "Preferences.sublime-settings" ).clear_on_change( CURRENT_PACKAGE_NAME )
+    sublime.load_settings( "Package Control.sublime-settings" ).clear_on_change( CURRENT_PACKAGE_NAME )
+    flush_indexes()
+
+def on_preferences_changed():
+    """
+        Enabling or disabling a package changes the available settings files, then the next panel
+        needs to scan all the resources again. The same happens when the descriptions mode changes.
+    """
+    global g_log_performance
+    global g_ignored_packages
+    global g_lazy_descriptions
+
+    preferences = sublime.load_settings( "Preferences.sublime-settings" )
+    ignored_packages = preferences.get( "ignored_packages", [] )
+    lazy_descriptions = preferences.get( "quick_settings_lazy_descriptions", True )
+    g_log_performance = preferences.get( "quick_settings_log_performance", False )
+
+    if ignored_packages != g_ignored_packages:
+        invalidate_resource_listings()
+
+    if ignored_packages != g_ignored_packages or lazy_descriptions != g_lazy_descriptions:
+        g_ignored_packages = ignored_packages
+        g_lazy_descriptions = lazy_descriptions
+        invalidate_preferences()
+
+def on_package_control_changed():
+    """
+        Installing or removing a package changes which resources are available.
+    """
+    global g_installed_packages
+    installed_packages = sublime.load_settings( "Package Control.sublime-settings" ).get( "installed_packages", [] )
+
+    if installed_packages != g_installed_packages:
+        g_installed_packages = installed_packages
+        invalidate_resource_listings()
+
 def load_settings():
     global g_settings
     global g_package_settings_path
+    global g_inputs_journal_path
+    global g_inputs_lock_path
+    global g_preferences_index_path
 
     g_package_settings_path = os.path.join( sublime.packages_path(), "User", CURRENT_PACKAGE_NAME + ".inputs" )
+    g_inputs_journal_path = g_package_settings_path + ".journal"
+    g_inputs_lock_path = g_package_settings_path + ".lock"
+    g_preferences_index_path = os.path.join( sublime.packages_path(), "User", CURRENT_PACKAGE_NAME + ".index" )
 
     try:
         # Returns an OrderedDict
@@ -78,16 +238,128 @@ def load_settings():
         log.exception( "Could not load the settings file" )
         write_data_file( g_package_settings_path, g_settings, debug=0 )
 
+    if replay_inputs_journal( g_settings ):
+        sublime.set_timeout_async( compact_inputs_journal, 0 )
+
 def save_index(key, index):
-    g_settings[key] = index
+    """
+        Update the index on memory right away, but only write it to the inputs journal when the
+        user stops selecting things for a while, or the panel is closed. Repeated updates of the
+        same key are merged into one journal entry.
+    """
+    global g_inputs_selections
+
     window = sublime.active_window()
     project_file_name = window.project_file_name()
 
-    window_settings = window.settings()
-    window_settings.set(last_quick_settings_input, g_settings)
+    with g_inputs_lock:
+        apply_index( g_settings, project_file_name, key, index )
+
+        # Keep the pending entries on the order they were last updated
+        g_pending_indexes.pop( ( project_file_name, key ), None )
+        g_pending_indexes[( project_file_name, key )] = index
+        g_inputs_selections += 1
+
+        # Only the global indexes are remembered by the window, not all the workspaces
+        window_settings = window.settings()
+        window_settings.set(last_quick_settings_input, { name: value
+                for name, value in g_settings.items() if name != 'workspaces_' + last_quick_settings_input })
+
+    schedule_flush_indexes()
+
+def schedule_flush_indexes():
+    global g_flush_indexes_id
+    g_flush_indexes_id += 1
+    flush_indexes_id = g_flush_indexes_id
+
+    def flush_when_idle():
+
+        # Newer selections were done meanwhile
+        if flush_indexes_id == g_flush_indexes_id:
+            flush_indexes()
+
+    sublime.set_timeout_async( flush_when_idle, INPUTS_FLUSH_DELAY )
+
+def flush_indexes():
+    """
+        Append the pending indexes to the inputs journal with a single write. The file is written
+        without holding `g_inputs_lock`, so `save_index()` does not wait for it on the UI thread.
+    """
+    global g_inputs_writes
+    global g_inputs_selections
+    global g_inputs_journal_entries
+
+    with g_inputs_lock:
+
+        if not g_pending_indexes:
+            return
+
+        # They are only removed after written, so a compaction meanwhile still applies them
+        pending_indexes = list( g_pending_indexes.items() )
+        selections = g_inputs_selections
+        g_inputs_selections = 0
+
+    entries = [ json.dumps( [project_file_name, key, index] ) + "\n"
+            for ( project_file_name, key ), index in pending_indexes ]
+
+    with g_performance_stats.measure( "inputs write" ), InputsFileLock( g_inputs_lock_path ):
+        append_inputs_journal( "".join( entries ) )
+
+    with g_inputs_lock:
+
+        for pending_key, index in pending_indexes:
+
+            # Newer selections of the same key are still pending
+            if g_pending_indexes.get( pending_key ) == index:
+                del g_pending_indexes[pending_key]
+
+        g_inputs_writes += 1
+        g_inputs_journal_entries += len( entries )
+
+        log( 2, "flush_indexes: Wrote %s entries for %s selections, %s writes on this session",
+                len( entries ), selections, g_inputs_writes )
+
+    if g_inputs_journal_entries >= MAXIMUM_JOURNAL_ENTRIES:
+        compact_inputs_journal()
+
+def start_inputs_session():
+    """
+        Count the inputs journal writes of each panel session from zero.
+    """
+    global g_inputs_writes
+
+    with g_inputs_lock:
+        g_inputs_writes = 0
+
+def end_inputs_session():
+    """
+        Write the indexes still pending when the panel is closed, and log the session writes.
+    """
+    flush_indexes()
+    log( 2, "end_inputs_session: The session did %s inputs journal writes", g_inputs_writes )
+
+def append_inputs_journal(text):
+    """
+        Start on a new line when the last append was truncated by a crash, otherwise the new entries
+        would be joined to the truncated one and ignored with it.
+    """
+
+    with open( g_inputs_journal_path, 'a+b' ) as journal_file:
+        journal_file.seek( 0, os.SEEK_END )
+
+        if journal_file.tell() > 0:
+            journal_file.seek( -1, os.SEEK_END )
+
+            if journal_file.read( 1 ) != b"\n":
+                text = "\n" + text
+
+        journal_file.write( text.encode( 'utf-8' ) )
+
+def apply_index(settings, project_file_name, key, index):
+    settings[key] = index
 
     if project_file_name:
-        workspaces = g_settings.setdefault( 'workspaces_' + last_quick_settings_input, OrderedDict() )
+        workspaces = settings.setdefault( 'workspaces_' + last_quick_settings_input, OrderedDict() )
 
         # https://docs.python.org/3/library/collections.html#collections.OrderedDict.move_to_end
         # https://stackoverflow.com/questions/16664874/how-can-i-add-an-element-at-the-top-of-an-ordereddict-in-python
@@ -96,10 +368,133 @@ def save_index(key, index):
         workspacesetting[key] = index
         workspaces.move_to_end( project_file_name, last=False )
 
-        while len( workspaces ) > MAXIMUM_WORSPACES_ENTRIES:
+        maximum_workspaces = sublime.load_settings( "Preferences.sublime-settings" ).get(
+                "quick_settings_maximum_workspaces", MAXIMUM_WORSPACES_ENTRIES )
+
+        # Each new workspace evicts at most one, the least recently used at the end
+        while len( workspaces ) > maximum_workspaces:
             pop_dict_last_item( workspaces )
 
-    write_data_file( g_package_settings_path, g_settings, debug=0 )
+def replay_inputs_journal(settings):
+    """
+        Apply the journal entries over the settings loaded from the inputs file. A crash while
+        appending can only truncate the last entry, which is ignored, because the next append
+        starts on a new line.
+
+        @return how many entries were applied
+    """
+    global g_inputs_journal_entries
+    g_inputs_journal_entries = 0
+
+    if not os.path.exists( g_inputs_journal_path ):
+        return 0
+
+    with open( g_inputs_journal_path, 'r', encoding='utf-8' ) as journal_file:
+
+        for line in journal_file:
+
+            try:
+                project_file_name, key, index = json.loads( line )
+
+            except ( ValueError, TypeError ):
+                log( 1, "replay_inputs_journal: Skipping the invalid entry %r", line )
+                continue
+
+            apply_index( settings, project_file_name, key, index )
+            g_inputs_journal_entries += 1
+
+    return g_inputs_journal_entries
+
+def compact_inputs_journal():
+    """
+        Merge the journal into the inputs file, which is replaced atomically, so a crash leaves
+        either the old or the new file. The file lock stops other Sublime Text instances sharing
+        the same `Packages/User` directory from appending to the journal meanwhile.
+    """
+    global g_settings
+    global g_inputs_journal_entries
+
+    # The files are only handled by the file lock, so `save_index()` does not wait for them
+    with g_performance_stats.measure( "inputs compaction" ), InputsFileLock( g_inputs_lock_path ):
+
+        try:
+            settings = load_data_file( g_package_settings_path, wait_on_error=False, exceptions=True )
+
+        except Exception as error:
+            log( 1, "compact_inputs_journal: Could not load the settings file, using the settings on memory" )
+
+            with g_inputs_lock:
+                settings = copy.deepcopy( g_settings )
+
+        replay_inputs_journal( settings )
+        temporary_path = g_package_settings_path + ".tmp"
+
+        write_data_file( temporary_path, settings, debug=0 )
+        os.replace( temporary_path, g_package_settings_path )
+
+        if os.path.exists( g_inputs_journal_path ):
+            os.remove( g_inputs_journal_path )
+
+    with g_inputs_lock:
+        g_inputs_journal_entries = 0
+
+        # Still not written to the journal, but already applied on memory
+        for ( project_file_name, key ), index in g_pending_indexes.items():
+            apply_index( settings, project_file_name, key, index )
+
+        # The journal may contain entries from other instances
+        g_settings = settings
+
+    log( 2, "compact_inputs_journal: Compacted the inputs file" )
+
+class InputsFileLock():
+    """
+        Lock shared between threads and processes, held while the lock file exists.
+    """
+
+    def __init__(self, lock_path, timeout=5.0, stale_timeout=30.0):
+        self.lock_path     = lock_path
+        self.timeout       = timeout
+        self.stale_timeout = stale_timeout
+        self.is_locked     = False
+
+    def __enter__(self):
+        start_time = time.time()
+
+        while True:
+
+            try:
+                os.close( os.open( self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY ) )
+                self.is_locked = True
+                return self
+
+            except FileExistsError:
+
+                try:
+                    # Some instance crashed while holding the lock
+                    if time.time() - os.path.getmtime( self.lock_path ) > self.stale_timeout:
+                        os.remove( self.lock_path )
+                        continue
+
+                except OSError:
+                    continue
+
+                if time.time() - start_time > self.timeout:
+                    log( 1, "InputsFileLock: Could not lock %s, continuing without it", self.lock_path )
+                    return self
+
+                time.sleep( 0.005 )
+
+    def __exit__(self, exception_type, exception_value, traceback):
+
+        if self.is_locked:
+            self.is_locked = False
+
+            try:
+                os.remove( self.lock_path )
+
+            except OSError:
+                pass
 
 def get_index(key):
     indexdict = _get_index(key)
@@ -137,10 +532,6 @@ def show_quick_panel(view, options, done, highlighted=None, last=-1):
     sublime.set_timeout(lambda: view.window().show_quick_panel(options, done, sublime.KEEP_OPEN_ON_FOCUS_LOST, last, highlighted), 10)
 
 
-def get_preference_name(file):
-    return os.path.basename(file).rsplit('.', 1)[0]
-
-
 def json_list(x):
 
     d = sublime.decode_value(x)
@@ -149,275 +540,1241 @@ def json_list(x):
     if not isinstance(d, list):
         raise ValueError("Expected a JSON list")
 
-    return d
+    return d
+
+
+def json_dict(x):
+
+    d = sublime.decode_value(x)
+    #sys.stderr.write("d: %s\n" % d)
+
+    if not isinstance(d, dict):
+        raise ValueError("Expected a JSON dictionary")
+
+    return d
+
+
+# The validators accepted by the `meta.*` settings `validate` key by name
+VALIDATORS = \
+{
+    "int": int,
+    "str": str,
+    "float": float,
+    "json_list": json_list,
+    "json_dict": json_dict,
+}
+
+# The validators already resolved, indexed by their `validate` key as JSON
+g_validators = {}
+
+def get_validator(validate):
+    """
+        @validate   the `validate` key of a `meta.*` setting, i.e., the name of a built-in validator,
+                    a `Package Name.module.function` path, or the list of the allowed values
+
+        @return a function which returns the validated value, or raises ValueError when it is invalid.
+                The invalid validators fall back to `str`, which is also cached, so they are only
+                logged once.
+    """
+    key = json.dumps( validate, sort_keys=True )
+    validator = g_validators.get( key )
+
+    if validator:
+        return validator
+
+    if isinstance( validate, list ):
+        validator = _create_list_validator( validate )
+
+    elif not isinstance( validate, str ):
+        log( 1, "get_validator: The validator %r is not a name nor a list, using 'str' instead", validate )
+        validator = str
+
+    elif validate in VALIDATORS:
+        validator = VALIDATORS[validate]
+
+    else:
+
+        try:
+            module_name, function_name = validate.rsplit( '.', 1 )
+            validator = getattr( importlib.import_module( module_name ), function_name )
+
+        except Exception:
+            log.exception( "Could not load the validator '%s', using 'str' instead", validate )
+            validator = str
+
+    g_validators[key] = validator
+    return validator
+
+def _create_list_validator(allowed_values):
+
+    try:
+        allowed_set = frozenset( allowed_values )
+
+    except TypeError:
+        allowed_set = None
+
+    def validate_element(x):
+
+        try:
+            is_allowed = x in allowed_set if allowed_set is not None else x in allowed_values
+
+        except TypeError:
+            is_allowed = x in allowed_values
+
+        if not is_allowed:
+            raise ValueError("Value must be one of %s" % allowed_values)
+
+        return x
+
+    return validate_element
+
+
+def show_input(view, caption, initial, on_done=None, on_change=None, on_cancel=None, on_load=None):
+    window = view.window()
+
+    def do_input():
+        _initial = initial
+
+        if not isinstance(_initial, str):
+            _initial = json.dumps(_initial)
+
+        input_view = window.show_input_panel(caption, _initial, on_done=on_done, on_change=on_change, on_cancel=on_cancel)
+
+        if on_load:
+            on_load(input_view)
+
+    sublime.set_timeout(do_input, 10)
+
+
+# resolution order of settings
+#    Packages/Default/Preferences.sublime-settings
+#    Packages/Default/Preferences (<platform>).sublime-settings
+#    Packages/User/Preferences.sublime-settings
+#    <Project Settings>
+#    Packages/<syntax>/<syntax>.sublime-settings
+#    Packages/User/<syntax>.sublime-settings
+#    <Buffer Specific Settings>
+
+def get_current_syntax(view, syntax=None):
+    current_syntax = None
+    settings = view.settings()
+
+    if syntax:
+        current_syntax = syntax
+
+    elif settings.has('syntax'):
+        current_syntax = get_preference_name(settings.get('syntax'))
+
+    return current_syntax
+
+
+def save_preference(view, setting_file, setting_name, value):
+    # log( 2, "save__preference" )
+    # log( 2, "save__preference, setting_file: " +  str( setting_file ) )
+    # log( 2, "save__preference, setting_name: " + str( setting_name ) )
+    # log( 2, "save__preference, value:        " +  str( value ) )
+    save_preferences(view, setting_file, {setting_name: value})
+
+
+def save_preferences(view, setting_file, values):
+    """
+        Save several settings of the same settings file with a single write, skipping the ones
+        which already have the new value.
+
+        @values   a dictionary with the new value of each setting name
+    """
+
+    if setting_file == this_view_file:
+        settings = view.settings()
+
+        for setting_name, value in values.items():
+            settings.set(setting_name, value)
+
+        return
+
+    if setting_file == current_project_file:
+        window = view.window()
+        data = window.project_data()
+
+        if 'settings' not in data:
+            data['settings'] = {}
+
+        values = get_changed_values(data['settings'], values)
+
+        if values:
+            data['settings'].update(values)
+            window.set_project_data(data)
+            invalidate_project_settings(window)
+
+        return
+
+    setting_file = os.path.basename(setting_file)
+
+    # log( 2, "save__preference, setting_file: " + setting_file )
+    settings = sublime.load_settings(setting_file+'.sublime-settings')
+    values = get_changed_values(settings, values)
+
+    if not values:
+        return
+
+    for setting_name, value in values.items():
+        settings.set(setting_name, value)
+
+    resolve_preference_descriptions(setting_file, 'user')
+    sublime.save_settings(setting_file+'.sublime-settings')
+
+    invalidate_descriptions('Packages/User/'+setting_file+'.sublime-settings')
+
+    for setting_name, value in values.items():
+        update_preference_value(setting_file, 'user', setting_name, value)
+
+
+def get_changed_values(settings, values):
+    """
+        @settings   a `sublime.Settings` or a dictionary with the current values
+
+        @return the values which are different from the current ones, comparing them as JSON, so
+                `1` and `true` are not taken as the same value
+    """
+    changed_values = OrderedDict()
+
+    for setting_name, value in values.items():
+
+        if settings.get(setting_name) is None \
+                or json.dumps( settings.get(setting_name), sort_keys=True ) != json.dumps( value, sort_keys=True ):
+            changed_values[setting_name] = value
+
+    return changed_values
+
+
+def get_preference_fingerprint(preference_data):
+    return hashlib.sha1( preference_data.encode( 'utf-8' ) ).hexdigest()
+
+
+def parse_preference(preference_file, preference_data):
+    """
+        @preference_file   the resource path, used only for error reporting
+        @preference_data   the resource contents
+
+        @return a dictionary with the `[value, description]` pair of each setting on the file, where
+                the description is the `[start, end]` position of its comments on lazy mode
+    """
+    try:
+        return parse_settings(preference_data, g_lazy_descriptions)
+
+    except:
+        log( 1, "load_preferences: Error reading %s (preference_data is %s)", preference_file, preference_data )
+
+    return {}
+
+
+def create_index_entry(fingerprint, preference_settings):
+    return { 'fingerprint': fingerprint, 'lazy_descriptions': g_lazy_descriptions, 'settings': preference_settings }
+
+
+def is_indexed(indexed_file, fingerprint):
+    return indexed_file \
+            and indexed_file['fingerprint'] == fingerprint \
+            and indexed_file.get( 'lazy_descriptions' ) == g_lazy_descriptions
+
+
+def create_preference_setting(preference_file, setting):
+    """
+        @setting   the `[value, description]` pair stored on the preferences index
+
+        @return the `SettingRecord` with its value and description, or with the position of the
+                description on the resource when it is loaded lazily
+    """
+    value, description = setting
+
+    if isinstance( description, list ):
+        return SettingRecord( intern_value( value ), None, preference_file, tuple( description ) )
+
+    return SettingRecord( intern_value( value ), intern_value( description ) )
+
+
+def get_setting_description(setting):
+    """
+        @return the description of a `SettingRecord`, extracting it from the setting resource when
+                it was loaded lazily
+    """
+
+    if setting.description is not None:
+        return setting.description
+
+    key = ( setting.resource, ) + setting.span
+    description = g_descriptions.get( key )
+
+    if description is None:
+        resource, preference_data = g_descriptions_resource
+
+        if resource != setting.resource:
+            preference_data = sublime.load_resource( setting.resource )
+            g_descriptions_resource[:] = [ setting.resource, preference_data ]
+
+        description = format_description( preference_data, setting.span )
+        g_descriptions[key] = description
+
+        while len( g_descriptions ) > MAXIMUM_DESCRIPTIONS_ENTRIES:
+            g_descriptions.popitem( last=False )
+
+    else:
+        g_descriptions.move_to_end( key )
+
+    return description
+
+
+def invalidate_descriptions(preference_file):
+
+    for key in [ key for key in g_descriptions if key[0] == preference_file ]:
+        del g_descriptions[key]
+
+    if g_descriptions_resource[0] == preference_file:
+        g_descriptions_resource[:] = [ None, None ]
+
+
+def load_preferences_index():
+    """
+        Load the preferences index from `Packages/User` on the first call. Later calls reuse the
+        already loaded index, which is kept up to date by `load_preferences()`.
+    """
+    global g_preferences_index
+
+    if g_preferences_index is None:
+        g_preferences_index = {}
+
+        if os.path.exists( g_preferences_index_path ):
+
+            try:
+                preferences_index = load_data_file( g_preferences_index_path, wait_on_error=False, exceptions=True )
+
+                if preferences_index.get( 'version' ) == PREFERENCES_INDEX_VERSION:
+                    g_preferences_index = preferences_index.get( 'resources', {} )
+
+            except Exception as error:
+                log.exception( "Could not load the preferences index file" )
+
+    return g_preferences_index
+
+
+def save_preferences_index(preferences_index):
+    global g_preferences_index
+    g_preferences_index = preferences_index
+
+    index_data = { 'version': PREFERENCES_INDEX_VERSION, 'resources': preferences_index }
+    sublime.set_timeout_async( lambda: write_data_file( g_preferences_index_path, index_data, debug=0 ), 0 )
+
+
+def load_preferences():
+    """
+        @return the current snapshot of the preferences dictionary, see `load_preferences_snapshot()`
+    """
+    return load_preferences_snapshot()[1]
+
+
+def load_preferences_snapshot():
+    """
+        The preferences dictionary is shared by all windows and it is never changed after built.
+        Instead, each change publishes a new snapshot with a new version, then the snapshots and
+        anything computed from them can be kept while their version is the current one.
+
+        @return a tuple with the version and the preferences dictionary, which is only built again
+                after `invalidate_preferences()` and must not be changed by the callers
+    """
+    global g_preferences
+    global g_preferences_version
+
+    with g_preferences_lock:
+
+        if g_preferences is None:
+            g_preferences_version += 1
+
+            # Join the warm up, finishing its remaining steps right now
+            if g_warm_up_steps:
+                g_preferences = finish_steps( g_warm_up_steps )
+                cancel_warm_up()
+
+            else:
+                g_preferences = scan_preferences()
+
+        return g_preferences_version, g_preferences
+
+
+def is_preferences_loaded():
+    return g_preferences is not None
+
+
+def invalidate_preferences():
+    global g_preferences
+
+    with g_preferences_lock:
+        g_preferences = None
+        g_shared_values.clear()
+        cancel_warm_up()
+
+
+def warm_up_preferences():
+    """
+        Build the preferences dictionary on the async thread before the first panel is open,
+        handling one file per step, so other async callbacks can run between the steps.
+    """
+    global g_warm_up_steps
+
+    with g_preferences_lock:
+
+        if g_preferences is None and not g_warm_up_steps:
+            log( 2, "warm_up_preferences: Starting" )
+            g_warm_up_steps = iterate_scan_preferences( is_incremental=True )
+            sublime.set_timeout_async( _warm_up_preferences_step, 0 )
+
+
+def _warm_up_preferences_step():
+    global g_preferences
+    global g_preferences_version
+
+    with g_preferences_lock:
+        steps = g_warm_up_steps
+
+        # It was joined by `load_preferences()` or cancelled
+        if not steps:
+            return
+
+        try:
+            next( steps )
+
+        except StopIteration as stop:
+            g_preferences = stop.value
+            g_preferences_version += 1
+            cancel_warm_up()
+
+            log( 2, "warm_up_preferences: Finished" )
+            return
+
+    sublime.set_timeout_async( _warm_up_preferences_step, 0 )
+
+
+def cancel_warm_up():
+    global g_warm_up_steps
+    g_warm_up_steps = None
+
+
+def scan_preferences():
+    return finish_steps( iterate_scan_preferences() )
+
+
+def finish_steps(steps):
+    """
+        Run all the remaining steps of a generator.
+
+        @return the generator return value
+    """
+
+    try:
+
+        while True:
+            next( steps )
+
+    except StopIteration as stop:
+        return stop.value
+
+
+def iterate_scan_preferences(is_incremental=False):
+    """
+        Generator which yields after loading each resource, and returns the preferences dictionary.
+        Only the resources which contents changed since the last time they were indexed are
+        parsed again, the remaining ones are loaded from the preferences index.
+
+        @is_incremental   if True, yield after parsing each file instead of parsing all of them at once
+    """
+    # log( 2, "iterate__scan_preferences" )
+
+    discovery_start = time.perf_counter()
+    preferences_files = sublime.find_resources("*.sublime-settings")
+
+    # Only the time spent on the steps is measured, not the time waiting between them
+    discovery_time = time.perf_counter() - discovery_start
+    preferences_index = load_preferences_index()
+    updated_index = {}
+
+    preferences_data = []
+    g_preferences_locations.clear()
+    g_preferences_mtimes.clear()
+
+    for preference_file in preferences_files:
+        location = get_preference_location(preference_file)
+        g_preferences_locations.setdefault( location, [] ).append( preference_file )
+
+        # log( 2, "preference_file: " + str( preference_file ) )
+        discovery_start = time.perf_counter()
+        g_preferences_mtimes[preference_file] = get_resource_mtime(preference_file)
+        preference_data = sublime.load_resource(preference_file)
+        discovery_time += time.perf_counter() - discovery_start
+
+        if preference_data:
+            fingerprint = get_preference_fingerprint(preference_data)
+            indexed_file = preferences_index.get(preference_file)
+
+            if is_indexed(indexed_file, fingerprint):
+                updated_index[preference_file] = indexed_file
+
+            else:
+                updated_index[preference_file] = fingerprint
+                preferences_data.append( ( preference_file, preference_data ) )
+
+        yield
+
+    g_performance_stats.add( "discovery", discovery_time )
+    parsing_time = 0
+
+    parsed_settings = {}
+
+    for preference_file, preference_data in preferences_data:
+        parsing_start = time.perf_counter()
+        parsed_settings[preference_file] = parse_preference(preference_file, preference_data)
+
+        parsing_time += time.perf_counter() - parsing_start
+
+        if is_incremental:
+            yield
+
+    if preferences_data:
+        g_performance_stats.add( "parsing", parsing_time )
+
+    for preference_file, preference_settings in parsed_settings.items():
+        updated_index[preference_file] = create_index_entry(updated_index[preference_file], preference_settings)
+
+    def get_settings(preference_file):
+
+        if preference_file not in updated_index:
+            return {}
+
+        return { setting_name: create_preference_setting(preference_file, setting)
+                for setting_name, setting in updated_index[preference_file]['settings'].items() }
+
+    # Merge the settings on the resources order, as later resources override the earlier ones
+    preferences = merge_preferences(preferences_files, get_settings)
+
+    # for item in preferences:
+    #     print( "isinstance(" + str( item ) + ", str):  " + str( isinstance(item, str) ) )
+    #     print( "isinstance(" + str( item ) + ", dict): " + str( isinstance(item, dict) ) )
+    #     print( "item: " + json.dumps( preferences[item] ) )
+
+    if parsed_settings or len( updated_index ) != len( preferences_index ):
+        log( 2, "iterate_scan_preferences: Parsed %s of %s files", len( parsed_settings ), len( updated_index ) )
+        save_preferences_index( updated_index )
+
+    return preferences
+
+
+def update_preference_file(preference_file, preference_data):
+    """
+        Parse again only the given resource and rebuild only the `preferences[name][setting_type]`
+        dictionary it is merged into.
+
+        @preference_file   the resource path as `Packages/User/Preferences.sublime-settings`
+        @preference_data   the new resource contents
+    """
+    with g_preferences_lock:
+        preferences_index = load_preferences_index()
+        g_preferences_mtimes[preference_file] = get_resource_mtime(preference_file)
+
+        indexed_file = preferences_index.get(preference_file)
+        fingerprint = get_preference_fingerprint(preference_data)
+
+        if is_indexed(indexed_file, fingerprint):
+            return
+
+        log( 2, "update_preference_file: %s", preference_file )
+        preferences_index = dict( preferences_index )
+
+        # The warm up may have already loaded the old file contents
+        cancel_warm_up()
+        invalidate_descriptions(preference_file)
+
+        if preference_data:
+            preference_settings = parse_preference(preference_file, preference_data)
+            preferences_index[preference_file] = create_index_entry(fingerprint, preference_settings)
+
+        else:
+            preferences_index.pop(preference_file, None)
+
+        save_preferences_index( preferences_index )
+
+        if g_preferences is None:
+            return
+
+        location = get_preference_location(preference_file)
+        preference_files = g_preferences_locations.setdefault( location, [] )
+
+        if preference_file not in preference_files:
+            # Only list the resources to find out the merging order of the new file
+            preference_files[:] = [ resource
+                for resource in sublime.find_resources( os.path.basename( preference_file ) )
+                if get_preference_location(resource) == location ]
+
+            if preference_file not in preference_files:
+                preference_files.append( preference_file )
+
+        preference = {}
+
+        for resource in preference_files:
+            indexed_file = preferences_index.get(resource)
+
+            if indexed_file:
+
+                for setting_name, setting in indexed_file['settings'].items():
+                    preference[setting_name] = create_preference_setting(resource, setting)
+
+        preference_name, setting_type = location
+        replace_preference( preference_name, setting_type, preference )
+
+
+def resolve_preference_descriptions(preference_name, setting_type):
+    """
+        Extract the lazy descriptions of the `preferences[name][setting_type]` settings before their
+        file is rewritten by `sublime.save_settings()`, because their spans only point to the right
+        text on the current file contents.
+    """
+    with g_preferences_lock:
+
+        if g_preferences is None:
+            return
+
+        preference = g_preferences.get( preference_name, {} ).get( setting_type, {} )
+        lazy_settings = [ setting_name for setting_name, setting in preference.items() if setting.description is None ]
+
+        if not lazy_settings:
+            return
+
+        preference = dict( preference )
+
+        for setting_name in lazy_settings:
+            setting = preference[setting_name]
+            preference[setting_name] = SettingRecord( setting.value, intern_value( get_setting_description( setting ) ) )
+
+        replace_preference( preference_name, setting_type, preference )
+
+
+def update_preference_value(preference_name, setting_type, setting_name, value):
+    """
+        Update the in memory preferences after a setting is saved by this package, because
+        `sublime.save_settings()` does not trigger the `on_post_save` event.
+    """
+    with g_preferences_lock:
+
+        if g_preferences is None:
+            return
+
+        preference = dict( g_preferences.get( preference_name, {} ).get( setting_type, {} ) )
+        setting = preference.get( setting_name, SettingRecord() )
+
+        preference[setting_name] = setting._replace( value=value )
+        replace_preference( preference_name, setting_type, preference )
+
+
+def replace_preference(preference_name, setting_type, preference):
+    """
+        Publish a new snapshot of the preferences dictionary with the `preference` settings. Only
+        the dictionaries on the path to them are copied, and the snapshots already taken by the
+        open panels are not changed.
+    """
+    global g_preferences
+    global g_preferences_version
+
+    setting_types = dict( g_preferences.get( preference_name, {} ) )
+    setting_types[setting_type] = preference
+
+    preferences = dict( g_preferences )
+    preferences[preference_name] = setting_types
+
+    g_preferences = preferences
+    g_preferences_version += 1
+
+
+def get_resource_mtime(resource):
+    """
+        @return the modification time of the resource file, or None if it is not a file, as the
+                resources of the `.sublime-package` files
+    """
+
+    try:
+        return os.path.getmtime( os.path.join( sublime.packages_path(), *resource.split( '/' )[1:] ) )
+
+    except OSError:
+        return None
+
+
+def refresh_changed_preferences():
+    """
+        Update the preferences with the settings files changed since they were loaded without
+        triggering `on_post_save`, as by `git pull`, a settings sync or another editor. It only
+        checks the modification time of the files, then it can run when each session starts.
+    """
+
+    with g_preferences_lock:
+
+        if g_preferences is None:
+            return
+
+        changed_files = [ preference_file for preference_file, mtime in g_preferences_mtimes.items()
+                if mtime is not None and get_resource_mtime( preference_file ) != mtime ]
+
+    for preference_file in changed_files:
+        log( 2, "refresh_changed_preferences: %s", preference_file )
+
+        try:
+            # Read the file as the resources are, because the lazy descriptions are positions on it
+            with open( os.path.join( sublime.packages_path(), *preference_file.split( '/' )[1:] ), 'r',
+                    encoding='utf-8', newline='' ) as settings_file:
+                preference_data = settings_file.read()
+
+        # The file was removed
+        except OSError:
+            preference_data = ""
+
+        update_preference_file( preference_file, preference_data )
+
+
+def get_preference_resource(file_name):
+    """
+        @return the resource path as `Packages/User/Preferences.sublime-settings` for a file under
+                the packages directory, or None if the file is somewhere else
+    """
+    packages_path = os.path.realpath( sublime.packages_path() )
+    file_name = os.path.realpath( file_name )
+
+    if not file_name.startswith( packages_path + os.sep ):
+        return None
+
+    return "Packages/" + os.path.relpath( file_name, packages_path ).replace( os.sep, "/" )
+
+
+def get_project_settings(window):
+    """
+        @return the `settings` of the window project data, reusing the same snapshot until the
+                project file is saved or changed by this package
+    """
+    project_settings = g_project_settings.get( window.id() )
+
+    if project_settings is None:
+        project_data = window.project_data() or {}
+
+        project_settings = project_data.get( 'settings', {} )
+        g_project_settings[window.id()] = project_settings
+
+    return project_settings
+
+
+def invalidate_project_settings(window):
+    g_project_settings.pop( window.id(), None )
+
+
+def get_search_index():
+    """
+        Build the search index on the first search, and again only after the preferences change.
+        It must not be called on the UI thread, as building it loads the settings descriptions.
+
+        @return the search index of the current preferences
+    """
+    global g_search_index
+    version, preferences = load_preferences_snapshot()
+    search_index = g_search_index
+
+    if search_index is not None and search_index.version == version:
+        return search_index
+
+    # Do not hold the lock while building, so opening a panel does not wait for it
+    search_index = SettingsSearchIndex( preferences, version, search_index )
+
+    with g_preferences_lock:
+
+        # Another search may have already published the index of a newer snapshot
+        if g_search_index is None or g_search_index.version < version:
+            g_search_index = search_index
+
+    return search_index
+
+
+def get_shared_value(version, cache_key, create):
+    """
+        The values computed only from the immutable preferences snapshot, as the resolvers, are
+        shared by all windows until a new snapshot is published.
+
+        @version     the version of the snapshot the value is computed from
+        @cache_key   identifies the value, which must be the same for all sessions layered over
+                     the same snapshot
+        @create      a function computing the value when it is not cached
+
+        @return the value, which must not be changed by the callers
+    """
+    global g_shared_values_version
+
+    with g_preferences_lock:
+
+        if version != g_shared_values_version:
+
+            # A session still using an old snapshot must not replace the cached values
+            if version != g_preferences_version:
+                return create()
+
+            g_shared_values.clear()
+            g_shared_values_version = version
+
+        value = g_shared_values.get(cache_key)
+
+        if value is None:
+            value = create()
+            g_shared_values[cache_key] = value
+
+        return value
+
+
+def get_option_value(setting_file, setting_name, value):
+    """
+        @return the JSON text shown for the setting value on the panel row, serializing the value
+                again only when it changed since the last time the row was shown
+    """
+    key = ( setting_file, setting_name )
+    cached = g_option_values.get( key )
+
+    if cached:
+        cached_value, text = cached
+
+        # Containers are compared by identity, as they are shared with the preferences dictionary,
+        # and `1 == True` or `[1] == [True]` would reuse the wrong text
+        if cached_value is value or ( type( cached_value ) is type( value ) and isinstance( value, SCALAR_TYPES ) and cached_value == value ):
+            return text
+
+    text = json.dumps( value )
+    g_option_values[key] = ( value, text )
+    return text
+
+
+def get_resource_listing(pattern):
+    """
+        @pattern   a `sublime.find_resources()` pattern, e.g., `*.tmTheme`
+
+        @return a tuple with the sorted resources matching `pattern` and their quick panel rows,
+                which must be copied before being changed
+    """
+    listing = g_resource_listings.get( pattern )
+
+    if listing is None:
+        resources = sorted( sublime.find_resources( pattern ) )
+        options = \
+        [
+            [ os.path.basename( resource ), os.path.dirname( resource ).replace( "Packages/", "" ) ]
+            for resource in resources
+        ]
+
+        listing = ( resources, options )
+        g_resource_listings[pattern] = listing
+
+    return listing
+
+def invalidate_resource_listings(file_name=None):
+    """
+        @file_name   if given, only the listings whose pattern matches this file are invalidated
+    """
+
+    if file_name is None:
+        g_resource_listings.clear()
+        return
+
+    base_name = os.path.basename( file_name )
+
+    for pattern in list( g_resource_listings.keys() ):
+
+        if fnmatch.fnmatch( base_name, pattern ):
+            g_resource_listings.pop( pattern, None )
+
+def start_session_profile():
+    """
+        Start profiling the session when the `quick_settings_profile_next_session` command armed it.
+    """
+    global g_profiler
+    global g_is_profiler_armed
+
+    if g_is_profiler_armed and g_profiler is None:
+        import cProfile
+
+        g_is_profiler_armed = False
+        g_profiler = cProfile.Profile()
+        g_profiler.enable()
+
+def stop_session_profile():
+    """
+        Write the session profile as `QuickSettings.pstats` and its summary sorted by the cumulative
+        time as `QuickSettings.profile.txt`, both on `Packages/User`.
+    """
+    global g_profiler
+    profiler = g_profiler
+
+    if profiler is None:
+        return
+
+    profiler.disable()
+    g_profiler = None
+
+    profile_path = os.path.join( sublime.packages_path(), "User", CURRENT_PACKAGE_NAME + ".pstats" )
+    summary_path = os.path.join( sublime.packages_path(), "User", CURRENT_PACKAGE_NAME + ".profile.txt" )
+
+    def write_profile():
+        import pstats
+        profiler.dump_stats( profile_path )
+
+        summary = io.StringIO()
+        stats = pstats.Stats( profiler, stream=summary )
+        stats.sort_stats( "cumulative" ).print_stats( PROFILE_SUMMARY_LINES )
+
+        with open( summary_path, 'w', encoding='utf-8' ) as summary_file:
+            summary_file.write( summary.getvalue() )
+
+        log( 2, "stop_session_profile: Wrote the session profile to %s", profile_path )
+        sublime.status_message( "Quick Settings: Wrote the session profile to %s" % summary_path )
+
+    sublime.set_timeout_async( write_profile, 0 )
+
+def load_syntax_names():
+    """
+        @return a frozenset with the names of all syntaxes, so they can be looked up in constant time
+    """
+
+    with g_performance_stats.measure( "syntax discovery" ):
+        return frozenset( get_preference_name( syntax ) for syntax_type in SYNTAX_TYPES for syntax in sublime.find_resources( syntax_type ) )
+
+
+class SettingsSearchIndex():
+    """
+        Inverted index from the words of the setting names and descriptions to the settings of
+        all files, so a query only looks at the settings containing its words. Each setting file
+        has its own index, then only the files changed since the last snapshot are indexed again.
+    """
+
+    WORD_RE = re.compile( r'[^\W_]+' )
+
+    EXACT_NAME_WEIGHT = 100
+    NAME_WEIGHT       = 10
+    DESCRIPTION_WEIGHT = 1
+
+    def __init__(self, preferences, version, previous=None):
+        """
+            @preferences   the dictionary built by `load_preferences()`
+            @version       the preferences version the index was built from
+            @previous      an index of an older snapshot, whose setting files indexes are reused for
+                           the files which did not change, as the snapshots share their dictionaries
+        """
+        self.version = version
+
+        # The `(preference, entries, postings, words)` of each setting file, see `index_setting_file()`
+        self.setting_files = {}
+
+        resources_data = {}
+        descriptions = {}
+        settings_count = 0
+
+        for setting_file in sorted( preferences ):
+            preference = preferences[setting_file]
+            setting_file_index = previous.setting_files.get( setting_file ) if previous else None
+
+            if setting_file_index is None or setting_file_index[0] is not preference:
+                setting_file_index = self.index_setting_file( preference, resources_data, descriptions )
+
+            self.setting_files[setting_file] = setting_file_index
+            settings_count += len( setting_file_index[1] )
+
+        log( 2, "SettingsSearchIndex: Indexed %s settings of %s files", settings_count, len( self.setting_files ) )
 
+    def index_setting_file(self, preference, resources_data, descriptions):
+        """
+            The descriptions are only kept while the index is built, as the lazy ones can be loaded
+            again for the search results.
 
-def json_dict(x):
+            @return a tuple with the `preference`, the list with the `(setting_name, setting)` of
+                    its settings, the postings of each word and the sorted words
+        """
+        settings = {}
+        entries  = []
+        postings = {}
 
-    d = sublime.decode_value(x)
-    #sys.stderr.write("d: %s\n" % d)
+        def add_posting(word, entry_id, weight):
+            posting = postings.setdefault( word, {} )
 
-    if not isinstance(d, dict):
-        raise ValueError("Expected a JSON dictionary")
+            if posting.get( entry_id, 0 ) < weight:
+                posting[entry_id] = weight
 
-    return d
+        # The defaults take precedence as they usually carry the documentation
+        for setting_type in sorted( preference, key=lambda setting_type: not setting_type.startswith( 'default' ) ):
 
+            for setting_name, setting in preference[setting_type].items():
 
-def show_input(view, caption, initial, on_done=None, on_change=None, on_cancel=None, on_load=None):
-    window = view.window()
+                if setting_name not in settings and not setting_name.startswith( 'meta.' ):
+                    settings[setting_name] = setting
 
-    def do_input():
-        _initial = initial
+        for setting_name in sorted( settings ):
+            setting = settings[setting_name]
+            description = self.get_description( setting, resources_data )
 
-        if not isinstance(_initial, str):
-            _initial = json.dumps(_initial)
+            entry_id = len( entries )
+            entries.append( ( setting_name, setting ) )
 
-        input_view = window.show_input_panel(caption, _initial, on_done=on_done, on_change=on_change, on_cancel=on_cancel)
+            add_posting( setting_name.lower(), entry_id, self.EXACT_NAME_WEIGHT )
 
-        if on_load:
-            on_load(input_view)
+            for word in self.WORD_RE.findall( setting_name.lower() ):
+                add_posting( word, entry_id, self.NAME_WEIGHT )
 
-    sublime.set_timeout(do_input, 10)
+            if description not in descriptions:
+                descriptions[description] = set( sys.intern( word ) for word in self.WORD_RE.findall( description.lower() ) )
 
+            for word in descriptions[description]:
+                add_posting( word, entry_id, self.DESCRIPTION_WEIGHT )
 
-def get_descriptions(data):
-    r"""get descriptions from preferences string
+        return preference, entries, postings, sorted( postings )
 
-    extract descriptions from passed ``data``.
+    @staticmethod
+    def get_description(setting, resources_data):
+        """
+            Unlike `get_setting_description()`, it does not use the descriptions cache of the UI thread.
 
-    :param data:
-        string containing json preferences file.
+            @resources_data   a dictionary with the contents of the resources already loaded
+        """
 
-    This is only a rough parser and will fetch also keys from
-    sub-dictionaries.  Calling function is responsible to
-    select correct data.
-    """
-    COMMENT_RE = re.compile(r"(?s)\s*//\s?(.*)")
-    COMMENT_RE2 = re.compile(r'''(?xs)
-        (?:
-            "(?:[^"\\]|\\.)*"
-            | (?:(?!//)[^"])
-        )+
-        (//.*)
-        ''')
-    COMMENT_START = re.compile(r"^\s*/\*(.*)")
-    COMMENT_END   = re.compile(r"(.*)\*/")
-    KEY_RE     = re.compile(r'\s*"([^"]+)"\s*:')
-    INDENT_RE = re.compile(r'^\s*')
+        if setting.description is not None:
+            return setting.description
 
-    description = {}
-    comment = ""
-    is_comment = False
+        if setting.resource not in resources_data:
+            resources_data[setting.resource] = sublime.load_resource( setting.resource )
 
-    for line in data.splitlines(1):
+        return format_description( resources_data[setting.resource], setting.span )
 
-        if is_comment:
-            m = COMMENT_END.search(line)
+    def search(self, query, limit=200):
+        """
+            All the query words must be found on the setting name or description, as a whole word
+            or as a word prefix. Whole words and name matches rank higher.
 
-            if m:
-                comment += m.group(1).rstrip()+"\n"
-                is_comment = False
+            @return a list with the `(setting_file, setting_name, description)` of the best matches
+        """
+        scores = None
 
-            else:
-                comment += line
+        for query_word in self.WORD_RE.findall( query.lower() ) or [ query.strip().lower() ]:
+            word_scores = {}
 
-            continue
+            for setting_file, ( preference, entries, postings, words ) in self.setting_files.items():
+                index = bisect.bisect_left( words, query_word )
 
-        m = COMMENT_START.match(line)
+                while index < len( words ) and words[index].startswith( query_word ):
+                    word = words[index]
+                    bonus = 2 if word == query_word else 1
 
-        if m:
-            is_comment = True
-            comment += m.group(1).rstrip()+"\n"
-            continue
+                    for entry_id, weight in postings[word].items():
+                        key = ( setting_file, entry_id )
+                        word_scores[key] = max( word_scores.get( key, 0 ), weight * bonus )
 
-        m = COMMENT_RE.match(line)
+                    index += 1
 
-        if m:
-            s = m.group(1)
+            if scores is None:
+                scores = word_scores
 
-            if not s: s = "\n"
-            comment += s
-            continue
+            else:
+                scores = { key: score + word_scores[key] for key, score in scores.items() if key in word_scores }
 
-        m = COMMENT_RE2.match(line)
+        def get_entry(key):
+            setting_file, entry_id = key
+            setting_name, setting = self.setting_files[setting_file][1][entry_id]
+            return setting_file, setting_name, setting
 
-        if m:
-            #sys.stderr.write("line1: %s\n" % (repr(line)))
-            line = line[:m.start(1)].rstrip()+"\n"
-            #sys.stderr.write("line2: %s\n" % (repr(line)))
+        def sort_key(item):
+            setting_file, setting_name, setting = get_entry( item[0] )
+            return -item[1], setting_file != default_preferences_file, setting_name, setting_file
 
-        if not line.strip(): # empty line resets current comment
-            comment = ""
-            continue
+        ranked = sorted( ( scores or {} ).items(), key=sort_key )[:limit]
+        resources_data = {}
 
-        m = KEY_RE.match(line)
+        return [ ( setting_file, setting_name, self.get_description( setting, resources_data ) )
+                for setting_file, setting_name, setting in ( get_entry( key ) for key, score in ranked ) ]
 
-        if m:
 
-            while comment.startswith('\n'):
-                comment = comment[1:]
+class PreviewScheduler():
+    """
+        Coalesce the previews of the highlighted values, applying only the latest one after the user
+        stops on it for the dwell time, because settings like `color_scheme` re-render the whole
+        window on each change.
+    """
 
-            indent = INDENT_RE.match(comment).group(0)
+    def __init__(self, cost_class="cheap"):
+        dwell_times = sublime.load_settings( "Preferences.sublime-settings" ).get(
+                "quick_settings_preview_dwell_times", PREVIEW_DWELL_TIMES )
 
-            if indent:
-                comment = ''.join([ l.startswith(indent) and l[len(indent):] or l for l in comment.splitlines(1) ])
-            description[m.group(1)] = {"description": comment.replace("\r", "") or "No help available"}
-            comment = ""
+        self.dwell_time = dwell_times.get( cost_class, PREVIEW_DWELL_TIMES.get( cost_class, 0 ) )
+        self.preview_id = 0
+        self.pending = None
 
-    return description
+    def preview(self, settings, setting_name, value):
 
+        if self.dwell_time <= 0:
+            self.cancel()
+            settings.set( setting_name, value )
+            return
 
-# resolution order of settings
-#    Packages/Default/Preferences.sublime-settings
-#    Packages/Default/Preferences (<platform>).sublime-settings
-#    Packages/User/Preferences.sublime-settings
-#    <Project Settings>
-#    Packages/<syntax>/<syntax>.sublime-settings
-#    Packages/User/<syntax>.sublime-settings
-#    <Buffer Specific Settings>
+        self.preview_id += 1
+        self.pending = ( settings, setting_name, value )
 
-def get_current_syntax(view, syntax=None):
-    current_syntax = None
-    settings = view.settings()
+        def apply_preview(preview_id):
 
-    if syntax:
-        current_syntax = syntax
+            if preview_id == self.preview_id:
+                self.flush()
 
-    elif settings.has('syntax'):
-        current_syntax = get_preference_name(settings.get('syntax'))
+        preview_id = self.preview_id
+        sublime.set_timeout( lambda: apply_preview( preview_id ), self.dwell_time )
 
-    return current_syntax
+    def flush(self):
+        """
+            Apply the pending preview right away, e.g., when the highlighted value is selected.
+        """
+        pending = self.pending
+        self.cancel()
 
+        if pending:
+            settings, setting_name, value = pending
+            settings.set( setting_name, value )
 
-def save_preference(view, setting_file, setting_name, value):
-    # log( 2, "save__preference" )
-    # log( 2, "save__preference, setting_file: " +  str( setting_file ) )
-    # log( 2, "save__preference, setting_name: " + str( setting_name ) )
-    # log( 2, "save__preference, value:        " +  str( value ) )
+    def cancel(self):
+        self.preview_id += 1
+        self.pending = None
 
-    if setting_file == this_view_file:
-        settings = view.settings()
-        settings.set(setting_name, value)
-        return
 
-    if setting_file == current_project_file:
-        data = view.window().project_data()
+class PerformanceStats():
+    """
+        Keep the durations of the phases of the Quick Settings sessions on memory, so a slow panel
+        can be told apart as slow discovery, parsing or disk access.
+    """
 
-        if 'settings' not in data:
-            data['settings'] = {}
+    def __init__(self):
+        self.lock    = threading.Lock()
+        self.counts  = OrderedDict()
+        self.samples = {}
 
-        data['settings'][setting_name] = value
-        view.window().set_project_data(data)
-        return
+    def measure(self, phase):
+        """
+            @return a context manager which adds the time spent inside it to `phase`
+        """
+        return PhaseTimer( self, phase )
 
-    setting_file = os.path.basename(setting_file)
+    def add(self, phase, seconds):
 
-    # log( 2, "save__preference, setting_file: " + setting_file )
-    settings = sublime.load_settings(setting_file+'.sublime-settings')
+        with self.lock:
 
-    settings.set(setting_name, value)
-    sublime.save_settings(setting_file+'.sublime-settings')
+            if phase not in self.counts:
+                self.counts[phase] = 0
+                self.samples[phase] = deque( maxlen=MAXIMUM_PERFORMANCE_SAMPLES )
 
+            self.counts[phase] += 1
+            self.samples[phase].append( seconds )
 
-def load_preferences():
-    # log( 2, "load__preferences" )
+        if g_log_performance:
+            log( 2, "%s: %.2f ms", phase, seconds * 1000 )
 
-    preferences = {}
-    preferences_files = sublime.find_resources("*.sublime-settings")
+    def get_summary(self):
+        """
+            @return a list with the `(phase, count, p50, p95, max)` of each phase, where the
+                    percentiles and the maximum are from the last `MAXIMUM_PERFORMANCE_SAMPLES`
+        """
+        summary = []
 
-    for preference_file in preferences_files:
+        with self.lock:
 
-        # log( 2, "load__preferences, preference_file: {0}".format( preference_file ) )
-        preference_name = get_preference_name(preference_file)
+            for phase, count in self.counts.items():
+                samples = sorted( self.samples[phase] )
+                percentile = lambda ratio: samples[int( round( ratio * ( len( samples ) - 1 ) ) )]
 
-        # log( 2, "load__preferences, preference_name: {0}".format( preference_name ) )
-        platform = "any"
+                summary.append( ( phase, count, percentile( 0.5 ), percentile( 0.95 ), samples[-1] ) )
 
-        if preference_name[-5:].lower() == "(osx)":
-            preference_name = preference_name[:-6]
-            platform = "osx"
+        return summary
 
-        elif preference_name[-9:].lower() == "(windows)":
-            preference_name = preference_name[:-10]
-            platform = "windows"
+    def format_summary(self):
+        lines = [ "Quick Settings performance stats, in milliseconds", "" ]
+        lines.append( "%-20s %8s %10s %10s %10s" % ( "phase", "count", "p50", "p95", "max" ) )
 
-        elif preference_name[-7:].lower() == "(linux)":
-            preference_name = preference_name[:-8]
-            platform = "linux"
+        for phase, count, p50, p95, maximum in self.get_summary():
+            lines.append( "%-20s %8d %10.2f %10.2f %10.2f" % ( phase, count, p50 * 1000, p95 * 1000, maximum * 1000 ) )
 
-        # log( 2, "load__preferences, preference_name: {0}".format( preference_name ) )
+        if len( lines ) < 4:
+            lines.append( "Nothing was measured yet." )
 
-        if preference_name == "Base File":
-            preference_name = default_preferences_file
+        return "\n".join( lines ) + "\n"
 
-        if preference_name == "Global":
-            preference_name = default_preferences_file
 
-        if "/User/" in preference_file:
-            setting_type = "user"
+class PhaseTimer():
 
-        else:
-            setting_type = "default"
+    def __init__(self, performance_stats, phase):
+        self.performance_stats = performance_stats
+        self.phase = phase
 
-        if platform != "any":
-            setting_type = setting_type+"_"+platform
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
 
-        if preference_name not in preferences:
-            preferences[preference_name] = {}
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.performance_stats.add( self.phase, time.perf_counter() - self.start )
 
-        if setting_type not in preferences[preference_name]:
-            preferences[preference_name][setting_type] = {}
 
-        #sys.stderr.write("preference_name: %s, setting_type: %s\n" % (preference_name, setting_type))
-        preference = preferences[preference_name][setting_type]
+g_performance_stats = PerformanceStats()
 
-        # log( 2, "preference: " + str( preference ) )
-        preference_data = sublime.load_resource(preference_file)
 
-        if preference_data:
-            preference_settings = {}
+class SettingsTransaction():
+    """
+        The changes of a batch edit, saved with a single write per settings file on `commit()`.
+        The previews shown on the view while editing are undone by `rollback()`.
+    """
 
-            try:
-                #import spdb ; spdb.start()
-                description = get_descriptions(preference_data)
+    def __init__(self, view):
+        self.view          = view
+        self.changes       = OrderedDict()
+        self.view_settings = {}
 
-                #sys.stderr.write("preference_data: %s\n" % preference_)
-                preference_data = sublime.decode_value(preference_data)
+    def __len__(self):
+        return sum( len( values ) for values in self.changes.values() )
 
-                for setting_name, setting_value in preference_data.items():
+    def set_value(self, setting_file, setting_name, value):
+        self.changes.setdefault( setting_file, OrderedDict() )[setting_name] = value
 
-                    if setting_name not in description:
-                        preference_settings[setting_name] = {"description": "No help available"}
+    def get_values(self, setting_file):
+        return self.changes.get( setting_file, {} )
 
-                    else:
-                        preference_settings[setting_name] = description[setting_name]
+    def save_view_setting(self, setting_name):
+        """
+            Remember the view setting before its first preview, so `rollback()` can restore it.
+        """
 
-                    preference_settings[setting_name]['value'] = setting_value
+        if setting_name not in self.view_settings:
+            settings = self.view.settings()
+            self.view_settings[setting_name] = ( settings.has( setting_name ), settings.get( setting_name ) )
 
-            except:
-                log( 1, "load_preferences: Error reading %s (preference_data is %s)", preference_file, preference_data )
+    def commit(self):
+        view = self.view
+        changes = self.changes
 
-            preference.update(preference_settings)
+        def save():
 
-    # for item in preferences:
-    #     print( "isinstance(" + str( item ) + ", str):  " + str( isinstance(item, str) ) )
-    #     print( "isinstance(" + str( item ) + ", dict): " + str( isinstance(item, dict) ) )
-    #     print( "item: " + json.dumps( preferences[item] ) )
+            with g_performance_stats.measure( "transaction commit" ):
 
-    return preferences
+                for setting_file, values in changes.items():
+                    save_preferences( view, setting_file, values )
 
+            log( 2, "SettingsTransaction: Saved %s settings on %s files", len( self ), len( changes ) )
 
-def load_syntax_names():
-    syntax_names = []
-    syntax_types = [ "*.tmLanguage", "*.sublime-syntax" ]
+        sublime.set_timeout_async( save, 0 )
+
+    def rollback(self):
+        settings = self.view.settings()
 
-    for syntax_type in syntax_types:
-        syntaxes = sublime.find_resources(syntax_type)
+        for setting_name, ( has_setting, value ) in self.view_settings.items():
 
-        for syntax in syntaxes:
-            syntax_names.append(os.path.basename(syntax).rsplit('.', 1)[0])
+            if has_setting:
+                settings.set( setting_name, value )
 
-    return syntax_names
+            else:
+                settings.erase( setting_name )
 
 
 class HelperView():
@@ -430,11 +1787,15 @@ class HelperView():
         self.help_view_name = help_view_name
 
         self.help_view.settings().set('auto_indent', False)
+        self.help_view.set_scratch(True)
 
-    def disable_panel():
+        self.text      = None
+        self.render_id = 0
+
+    def disable_panel(self):
         self.is_enabled = False
 
-    def enable_panel():
+    def enable_panel(self):
         self.is_enabled = True
 
     def run_command(self, command, args={}):
@@ -442,6 +1803,28 @@ class HelperView():
         if self.is_enabled:
             self.help_view.run_command(command, args)
 
+    def set_text(self, text):
+        """
+            Replace the panel contents after the highlights stop for `HELP_VIEW_DELAY`, so scrolling
+            through the settings only renders the last highlighted description.
+        """
+
+        if not self.is_enabled:
+            return
+
+        self.render_id += 1
+        render_id = self.render_id
+
+        def render():
+
+            if render_id == self.render_id and text != self.text:
+                self.text = text
+
+                with g_performance_stats.measure( "help rendering" ):
+                    self.help_view.run_command("quick_settings_replace_help_view", {"characters": text})
+
+        sublime.set_timeout( render, HELP_VIEW_DELAY )
+
     def show_panel(self):
 
         if self.is_enabled:
@@ -450,6 +1833,7 @@ class HelperView():
     def hide_panel(self):
 
         if self.is_enabled:
+            self.render_id += 1
             self.window.run_command("hide_panel", {"panel": "output."+self.help_view_name})
 
     def focus_begining(self):
@@ -458,6 +1842,47 @@ class HelperView():
             self.help_view.show(0)
 
 
+class QuickSettingsReplaceHelpViewCommand(sublime_plugin.TextCommand):
+    """
+        Replace the whole help view contents with a single edit, instead of a `select_all` followed
+        by an `insert`, which also moves the selection around.
+    """
+
+    def run(self, edit, characters=""):
+        self.view.replace( edit, sublime.Region( 0, self.view.size() ), characters )
+        self.view.sel().clear()
+        self.view.show( 0 )
+
+
+class QuickSettingsEventListener(sublime_plugin.EventListener):
+
+    def on_post_save_async(self, view):
+        file_name = view.file_name()
+
+        # A new or renamed user resource must show up on the resource pickers
+        if file_name.startswith( os.path.join( sublime.packages_path(), "User", "" ) ):
+            invalidate_resource_listings(file_name)
+
+        if file_name.endswith( ".sublime-settings" ):
+            preference_file = get_preference_resource(file_name)
+
+            if preference_file:
+
+                # Read the file as the resources are, because the lazy descriptions are positions on it
+                with open( file_name, 'r', encoding='utf-8', newline='' ) as settings_file:
+                    update_preference_file( preference_file, settings_file.read() )
+
+        elif file_name.endswith( ".sublime-project" ):
+
+            for window in sublime.windows():
+
+                if window.project_file_name() == file_name:
+                    invalidate_project_settings(window)
+
+    def on_pre_close_window(self, window):
+        invalidate_project_settings(window)
+
+
 # commands are
 #
 # Edit Preferences        --> User
@@ -475,6 +1900,15 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
     # }
     #
 
+    # The batch edit started with the `batch` argument, kept until it is committed or cancelled
+    transaction = None
+
+    # Incremented when the placeholder panel shown by `load_panel()` is closed or replaced
+    loading_id = 0
+
+    # Created when the session starts, after the preferences are loaded
+    help_view = None
+
     def set_setting_value(self, setting_file, setting_name, value):
         # log( 2, "set__setting_value, setting_file:      " + str( setting_file ) )
         # log( 2, "set__setting_value, setting_name:      " + str( setting_name ) )
@@ -483,8 +1917,21 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
         if setting_file == current_syntax_file:
             setting_file = self.current_syntax
 
-        save_preference(self.view, setting_file, setting_name, value)
-        self.options_names[self.index][1] = json.dumps(value)
+        if self.transaction is not None:
+            self.transaction.set_value(setting_file, setting_name, value)
+
+        else:
+
+            with g_performance_stats.measure( "preference save" ):
+                save_preference(self.view, setting_file, setting_name, value)
+
+            # Saving the setting published a new preferences snapshot. If they were invalidated
+            # meanwhile, they are only loaded again by the next panel, without blocking
+            if is_preferences_loaded():
+                self.load_setting_files()
+
+        self.options_names[self.index][1] = get_option_value(self.options_paths[self.index][0], setting_name, value)
+        self.resolvers.clear()
 
     def make_pref_rec(self, setting_file, setting_type, setting_name, value):
         return "%s/%s/%s" % (setting_file, setting_type, setting_name), value
@@ -494,42 +1941,56 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
             @setting_name   the name of the setting
             @setting_file   the name of the setting's file on self.setting_files[setting_file]
 
-            @return dictionary with the setting value and description
-                    dict: {'value': True, 'description': 'No help available'}
+            @return the `SettingRecord` with the setting value and description
+                    SettingRecord(value=True, description='No help available', resource=None, span=None)
         """
-        _setting = {'value': None, 'description': 'No help available'}
-        platform = sublime.platform()
-        settings = [ self.setting_files[setting_file], self.get_default_setting_names(setting_file) ]
+        return self.get_resolver(setting_file).get(setting_name)
 
-        setting_types = \
-        [
-            "user_%s" % platform,
-            "user",
-            "default_%s" % platform,
-            "default",
-        ]
+    def get_resolver(self, setting_file):
+        """
+            The resolvers are built once per panel, and dropped when a setting value is changed.
+            The project, view and batch values are only set on the session overlay of the shared
+            resolver.
+        """
+        resolver = self.resolvers.get(setting_file)
 
-        for setting in settings:
+        if resolver is None:
+            is_preferences = self.is_preferences(setting_file)
 
-            for setting_type in setting_types:
+            resolver = get_shared_value(self.preferences_version, self.get_cache_key('resolver', setting_file),
+                    lambda: create_resolver(self.setting_files, setting_file, sublime.platform(), is_preferences))
 
-                if setting_type in setting:
+            if setting_file in (current_project_file, this_view_file) or self.transaction is not None:
+                resolver = resolver.create_overlay()
 
-                    if setting_name in setting[setting_type]:
-                        _setting = setting[setting_type][setting_name]
+            self.resolvers[setting_file] = resolver
 
-                        if setting_file == this_view_file:
-                            _setting['value'] = self.view.settings().get(setting_name)
+            if setting_file == current_project_file:
+                resolver.add_values( current_project_file, get_project_settings(self.view.window()) )
 
-                        elif setting_file == current_project_file:
-                            data = self.view.window().project_data()
+            elif setting_file == this_view_file:
+                resolver.set_view_settings( this_view_file, self.view.settings() )
 
-                            if 'settings' in data and setting_name in data['settings']:
-                                _setting['value'] = data['settings'].get(setting_name)
+            # Show the values changed by the batch edit, which are still not saved
+            if self.transaction is not None:
+                pending_file = self.current_syntax if setting_file == current_syntax_file else setting_file
+                resolver.add_values( setting_file + '/batch', self.transaction.get_values(pending_file) )
 
-                        return _setting
+        return resolver
+
+    def get_cache_key(self, value_name, setting_file):
+        """
+            @return the key of a value shared by all sessions with `get_shared_value()`
+        """
+        return (value_name, setting_file, self.current_syntax if setting_file == current_syntax_file else None, self.is_preferences(setting_file))
 
-        return _setting
+    def get_sorted_setting_names(self, setting_file):
+        """
+            @return the sorted names of the `setting_file` settings, including the inherited
+                    `Preferences` ones, which are merged and sorted once per preferences snapshot
+        """
+        return get_shared_value(self.preferences_version, self.get_cache_key('setting names', setting_file),
+                lambda: tuple(sorted(self.get_setting_names(setting_file))))
 
     def get_default_setting_names(self, setting_name):
         pref_default = None
@@ -553,21 +2014,38 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
         else:
             pref_default = {'default': {}, 'default_'+sublime.platform(): {}}
 
-        return set \
-        (
-            [ x
-                for y in standard_settings_types
-                for x in setting.get(y, {}).keys()
-            ] +
-            [ x
-                for y in standard_settings_types
-                for x in pref_default.get(y, {}).keys()
-            ]
-        )
+        setting_names = set()
+
+        for setting_type in standard_settings_types:
+            setting_names.update( setting.get(setting_type, {}) )
+            setting_names.update( pref_default.get(setting_type, {}) )
+
+        return setting_names
 
     def is_preferences(self, setting_file):
         return setting_file in self.syntax_names or setting_file in standard_settings_names
 
+    def load_setting_files(self):
+        """
+            Layer the session overlay over the shared preferences snapshot, which is never changed,
+            with the syntaxes without a settings file and the view and project setting files.
+        """
+        self.preferences_version, preferences = load_preferences_snapshot()
+        empty_file = { 'default': {}, 'default_'+sublime.platform(): {} }
+
+        overlay = dict.fromkeys( [ syntax for syntax in self.syntax_names if syntax not in preferences ], empty_file )
+        current_syntax_setting = overlay.get( self.current_syntax, preferences.get( self.current_syntax ) )
+
+        # https://bitbucket.org/klorenz/sublimepreferenceseditor/pull-requests/4
+        if current_syntax_setting is not None:
+            overlay[current_syntax_file] = current_syntax_setting
+
+        overlay[this_view_file] = empty_file
+        overlay[current_project_file] = empty_file
+
+        self.setting_files = ChainMap( overlay, preferences )
+        self.resolvers.clear()
+
     def getDefaultValueAndDescription(self, setting_file, setting_name, is_metadata=False):
         """
         @setting_file  the name of the setting file name on self.setting_files
@@ -579,10 +2057,10 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
             setting_file: Default
             setting_name: adaptive_dividers
 
-        @return a dictionary with the keys `value` and `description` for the given setting file and setting name.
+        @return the `SettingRecord` with the `value` and `description` for the given setting file and setting name.
 
-        {'value': 0, 'description': 'Set to a value other than 0 to force wrapping at that column rather than the\nwindow width\n'}
-        {'value': './\\()"\'-:,.;<>~!@#$%^&*|+=[]{}`~?', 'description': 'Characters that are considered to separate words\n'}
+        SettingRecord(value=0, description='Set to a value other than 0 to force wrapping at that column rather than the\nwindow width\n', ...)
+        SettingRecord(value='./\\()"\'-:,.;<>~!@#$%^&*|+=[]{}`~?', description='Characters that are considered to separate words\n', ...)
         """
         setting = self.setting_files[setting_file]
 
@@ -597,15 +2075,15 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
         if is_metadata:
             return None
 
-        return {'value': 0, 'description': 'No Description available'}
+        return SettingRecord(0, 'No Description available')
 
     def getSettingMetadata(self, setting_file, setting_name, defaultValueAndDescription):
         """
             @setting_file                  the name of the setting file name on self.setting_files
             @setting_name                  the name of the setting
-            @defaultValueAndDescription    a dictionary with the keys `value` and `description` for
+            @defaultValueAndDescription    the `SettingRecord` with the `value` and `description` for
                                             the given setting file and setting setting_file.
-                                            {'value': 0, 'description': 'Set to a value other than 0 to force wrapping'}
+                                            SettingRecord(value=0, description='Set to a value other than 0 to force wrapping', ...)
             @return
         """
         settingMetadata = self.getDefaultValueAndDescription(setting_file, "meta."+setting_name, True)
@@ -613,9 +2091,9 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
         #sys.stderr.write("settingMetadata: %s\n" % settingMetadata)
         if settingMetadata:
-            return settingMetadata.get('value')
+            return settingMetadata.value
 
-        setting_value = defaultValueAndDescription.get('value')
+        setting_value = defaultValueAndDescription.value
 
         if isinstance(setting_value, bool):
             return \
@@ -671,12 +2149,13 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
         def done(index):
             # log( 8, "widget__select_bool, done, index: " + str( index ) )
             view.erase_status("preferences_editor")
+            self.preview.flush()
 
             if index < 1:
                 settings.set( setting_name, default )
 
                 if index < 0:
-                    return self.shutdown()
+                    return self.cancel()
 
             elif index == 1:
                 self.set_setting_value(setting_file, setting_name, True)
@@ -691,13 +2170,13 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
         def highlight(index):
 
             if index < 1:
-                settings.set(setting_name, default)
+                self.preview.preview(settings, setting_name, default)
 
             elif index == 1:
-                settings.set(setting_name, True)
+                self.preview.preview(settings, setting_name, True)
 
             elif index == 2:
-                settings.set(setting_name, False)
+                self.preview.preview(settings, setting_name, False)
 
         # for op in options: log( 2, "op: {0}".format( op ) )
         view.set_status("preferences_editor", "Set %s" % (setting_file + '/' + setting_name))
@@ -721,7 +2200,7 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
         _values  = []
 
         if len( values ) > 0 and isinstance(values[0], dict):
-            values.insert( 0, {"value": default, "caption": "Cancel Changes"} )
+            values = [ {"value": default, "caption": "Cancel Changes"} ] + values
 
             for data in values:
                 args.append( data.get('args', {}) )
@@ -731,16 +2210,17 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
                 commands.append( data.get('command') )
 
         else:
-            values.insert( 0, default )
+            values = [ default ] + values
             _values = values
             options = [ str(x) for x in values ]
 
-        options.remove( default )
+        options.pop( 0 )
         options.insert( 0, [ "Cancel Changes" ] )
 
         def done(index):
             # log( 8, "widget__select, done, index: %s" % str(index) )
             view.erase_status("preferences_editor")
+            self.preview.flush()
 
             if index < 1:
                 settings.set( setting_name, default )
@@ -749,7 +2229,7 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
                     return self.preferences_selector()
 
                 else:
-                    return self.shutdown()
+                    return self.cancel()
 
             # if command is set, let the command handle this preference
             if commands:
@@ -760,8 +2240,9 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
                     if types[index] == "window":
                         context = view.window()
 
+                    # The command handles the setting, then the session ends as the panel is not shown again
                     sublime.set_timeout(lambda: context.run_command(commands[index], args[index]), 10)
-                    return
+                    return self.cancel()
 
             self.set_setting_value(setting_file, setting_name, _values[index])
             sublime.status_message("Set %s to %s" % (setting_file + '/' + setting_name, str(_values[index])))
@@ -769,7 +2250,7 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
         def highlight(index):
             # log( 8, "widget__select, highlight: setting %s to %s" % (setting_name, _values[index]) )
-            settings.set(setting_name, _values[index])
+            self.preview.preview(settings, setting_name, _values[index])
 
         view.set_status("preferences_editor", "Set %s" % (setting_file + '/' + setting_name))
         show_quick_panel(view, options, done, highlight)
@@ -800,7 +2281,7 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
                 if index < 0:
                     settings.set( setting_name, default )
-                    return self.shutdown()
+                    return self.cancel()
 
                 value.append(other[index])
                 settings.set(setting_name, value)
@@ -819,7 +2300,7 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
                 if index < 0:
                     settings.set( setting_name, default )
-                    return self.shutdown()
+                    return self.cancel()
 
                 value.remove(value[index])
                 settings.set(setting_name, value)
@@ -842,7 +2323,7 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
                 if index < 0:
                     settings.set( setting_name, default )
-                    return self.shutdown()
+                    return self.cancel()
 
                 if index == 0:
                     self.set_setting_value(setting_file, setting_name, value)
@@ -874,7 +2355,11 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
     def widget_select_resource(self, option, value=None, validate=None, find_resources=""):
         # log( 8, "widget__select_resource, option: %s" % str(option) )
-        resources = sorted(sublime.find_resources(find_resources))
+        resources, options = get_resource_listing(find_resources)
+
+        # The listing is cached, then insert the extra rows on copies of it
+        resources = list(resources)
+        options   = list(options)
 
         setting_file = option[0]
         setting_name = option[1]
@@ -882,17 +2367,13 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
         view     = self.window.active_view()
         settings = self.view.settings()
 
-        options = []
         default = settings.get(setting_name, "")
-
-        for resource in resources:
-            options.append( [ os.path.basename(resource), os.path.dirname(resource).replace("Packages/", "") ] )
-
         options.insert( 0, ["Cancel Selection", "Go back to the settings menu"] )
         resources.insert( 0, default )
 
         def done(index):
             view.erase_status("preferences_editor")
+            self.preview.flush()
 
             if index < 1:
                 settings.set( setting_name, default )
@@ -901,7 +2382,7 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
                     self.preferences_selector()
 
                 else:
-                    return self.shutdown()
+                    return self.cancel()
 
             self.set_setting_value(setting_file, setting_name, resources[index])
             sublime.status_message("Set %s to %s" % (setting_file + '/' + setting_name, str( resources[index] )))
@@ -909,7 +2390,7 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
         def highlight(index):
             # log( 8, "widget__select_resource, highlight: setting %s to %s" % (setting_file, resources[index]) )
-            settings.set(setting_name, resources[index])
+            self.preview.preview(settings, setting_name, resources[index])
 
         view.set_status("preferences_editor", "Set %s" % (setting_file + '/' + setting_name))
         show_quick_panel(view, options, done, highlight)
@@ -926,6 +2407,7 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
         def done(value):
             view.erase_status("preferences_editor")
+            self.preview.flush()
 
             try:
                 value = validate(value)
@@ -942,14 +2424,16 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
             try:
                 value = validate(value)
-                settings.set(setting_name, value)
+                self.preview.preview(settings, setting_name, value)
                 # log( 8, "widget__input, change: set %s to %s" % (setting_name, value) )
 
             except ValueError as e:
+                self.preview.cancel()
                 settings.set( setting_name, default )
                 sublime.status_message("Invalid Value: %s" % e)
 
         def cancel():
+            self.preview.cancel()
             settings.set( setting_name, default )
             view.erase_status("preferences_editor")
             self.preferences_selector()
@@ -959,6 +2443,7 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
     def run_widget(self, option):
         # log( 8, "run__widget, option: " + str( option ) )
+        widget_start = time.perf_counter()
 
         setting_file = option[0]
         setting_name = option[1]
@@ -976,6 +2461,12 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
         validate = settingMetadata.get('validate', 'str')
         args     = settingMetadata.get('args', {})
 
+        # Expensive settings are only previewed after the user stops on a value
+        self.preview = PreviewScheduler(settingMetadata.get('preview', 'cheap'))
+
+        if self.transaction is not None:
+            self.transaction.save_view_setting(setting_name)
+
         # log( 8, "run__widget, widget:   " + str( widget ) )
         # log( 8, "run__widget, validate: " + str( validate ) )
         # log( 8, "run__widget, args:     " + str( args ) )
@@ -983,26 +2474,16 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
         userValueAndDescription = self.getUserValueAndDescription(setting_file, setting_name)
         # log( 8, "run__widget, userValueAndDescription: " + str( userValueAndDescription ) )
 
-        if isinstance(validate, list):
-            validate_in_list = validate
-
-            def _validate_element(x):
-
-                if x in validate_in_list:
-                    return x
-
-                else:
-                    raise ValueError("Value must be one of %s" % validate_in_list)
-
-            validate = _validate_element
-
-        elif '.' not in validate:
-            validate = eval(validate)
+        validate = get_validator(validate)
 
         if hasattr(self, "widget_"+widget):
             widget_func = getattr(self, "widget_"+widget)
 
-        widget_func(option, value=userValueAndDescription.get('value'), validate=validate, **args)
+        # The value and the arguments are shared with the preferences index, then widgets must not change them
+        value = copy.deepcopy( userValueAndDescription.value )
+        widget_func(option, value=value, validate=validate, **copy.deepcopy( args ))
+
+        g_performance_stats.add( "widget open", time.perf_counter() - widget_start )
 
     def change_value(self, options_path, index):
         setting_file = options_path[index][0]
@@ -1017,43 +2498,181 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
         self.run_widget(options_path[index])
 
     def shutdown(self):
-        self.help_view.hide_panel()
+        """
+            End the session. All paths ending it must call this, directly or by `cancel()`, so the
+            session profile is always stopped.
+        """
+
+        if self.help_view is not None:
+            self.help_view.hide_panel()
+
+        sublime.set_timeout_async( end_inputs_session, 0 )
+        stop_session_profile()
+
+        # Do not keep the preferences snapshot of the session while the panel is closed
+        self.setting_files = None
+        self.resolvers = {}
+
+    def cancel(self):
+        """
+            End the session, discarding the changes of the batch edit, if any.
+        """
 
-    def run(self, setting_file=None, syntax_name=None):
+        if self.transaction is not None:
+            self.transaction.rollback()
+            self.transaction = None
+
+        self.shutdown()
+
+    def commit(self):
+
+        if self.transaction is not None:
+            self.transaction.commit()
+            self.transaction = None
+
+    def run(self, setting_file=None, syntax_name=None, setting_name=None, batch=False):
         r"""
         :param syntax_name:
             Name of syntax, you want to edit settings for
 
         :param setting_file:
             Name of settings' file, you want to edit.
+
+        :param setting_name:
+            Name of the setting on `setting_file` to open the widget for, instead of the panel.
+
+        :param batch:
+            Whether to only save the changed settings when the session ends, with one write per file.
+        """
+        # A session which ended without `shutdown()`, as by an error, must not keep profiling
+        stop_session_profile()
+        start_session_profile()
+        start_inputs_session()
+
+        self.open_setting_name = setting_name
+
+        if batch:
+
+            if self.transaction is None:
+                self.transaction = SettingsTransaction(self.window.active_view())
+
+        # A batch edit left by a session which did not end must not take over this one
+        elif self.transaction is not None:
+            self.transaction.rollback()
+            self.transaction = None
+
+        self.view      = self.window.active_view()
+        self.resolvers = {}
+
+        # Other packages may have changed the project data since the last time
+        if setting_file is None:
+            invalidate_project_settings(self.window)
+
+        refresh_changed_preferences()
+
+        if is_preferences_loaded():
+            self.start_session(setting_file, syntax_name)
+
+        else:
+            self.load_panel(setting_file, syntax_name)
+
+    def load_panel(self, setting_file, syntax_name):
+        """
+            Show a placeholder panel right away, while the preferences and the syntaxes are loaded
+            on the async thread, then replace it by the real panel. If the placeholder is closed
+            before, the loaded preferences are kept for the next time, but no panel is shown.
         """
+        self.loading_id += 1
+        loading_id = self.loading_id
+
+        def done(index):
+
+            # The placeholder is also closed when it is replaced by the real panel
+            if loading_id == self.loading_id:
+                self.loading_id += 1
+                self.cancel()
+
+        def load():
+            syntax_names = None
 
-        self.view          = self.window.active_view()
-        self.setting_files = load_preferences()
+            try:
+                load_preferences()
+                syntax_names = load_syntax_names()
+
+            except Exception:
+                log.exception( "Could not load the preferences" )
+
+            finally:
+                sublime.set_timeout( lambda: show( syntax_names ), 0 )
+
+        def show(syntax_names):
+
+            if loading_id != self.loading_id:
+                return
+
+            # The preferences were invalidated again meanwhile
+            if syntax_names is not None and not is_preferences_loaded():
+                sublime.set_timeout_async( load, 0 )
+                return
+
+            self.loading_id += 1
+
+            if syntax_names is None:
+                sublime.status_message( "Quick Settings: Could not load the preferences, see the console for details" )
+                self.window.run_command( "hide_overlay" )
+                return self.cancel()
 
-        self.syntax_names   = load_syntax_names()
-        self.setting_file   = setting_file
+            self.start_session(setting_file, syntax_name, syntax_names)
+
+        loading_options = [ [ "Loading Settings...", "Press Esc to cancel" ] ]
+        self.window.show_quick_panel(loading_options, done, sublime.KEEP_OPEN_ON_FOCUS_LOST)
+
+        sublime.set_timeout_async( load, 0 )
+
+    def start_session(self, setting_file, syntax_name, syntax_names=None):
+        """
+            Load the syntaxes and the preferences snapshot once per session, which are reused by
+            all panels open from the main panel and the BACK option, until `shutdown()`.
+
+            @syntax_names   the syntaxes already loaded by `load_panel()`, if any
+        """
+        self.syntax_names   = load_syntax_names() if syntax_names is None else syntax_names
         self.current_syntax = get_current_syntax(self.view, syntax_name)
 
-        for syntax in self.syntax_names:
+        self.load_setting_files()
+        self.help_view = HelperView(self.window, "preferences_editor_help", self.view.settings().get('always_show_helper_view', False))
 
-            if syntax not in self.setting_files:
-                self.setting_files[syntax] = { 'default': {}, 'default_'+sublime.platform(): {} }
+        self.open_panel(setting_file)
 
-        # https://bitbucket.org/klorenz/sublimepreferenceseditor/pull-requests/4
-        if self.current_syntax in self.setting_files:
-            self.setting_files[current_syntax_file] = self.setting_files[self.current_syntax]
+    def open_panel(self, setting_file=None):
+        """
+            Build only the rows of the main panel, or of the `setting_file` panel, with the data
+            loaded by `start_session()`.
+        """
+        # The preferences were invalidated after the session started, as by `ignored_packages`
+        if not is_preferences_loaded():
+            return self.load_panel(setting_file, self.current_syntax)
 
-        self.setting_files[this_view_file] = { 'default': {}, 'default_'+sublime.platform(): {} }
-        self.setting_files[current_project_file] = { 'default': {}, 'default_'+sublime.platform(): {} }
+        panel_start = time.perf_counter()
+        self.setting_file = setting_file
+
+        # A setting file was saved after the session started
+        if self.preferences_version != g_preferences_version:
+            self.load_setting_files()
 
         options_names = []
         options_paths = []
         options_desciptions = []
 
-        options_names.append( [ "QUIT (Esc)", "End Edit Settings" ] )
+        if self.transaction is not None:
+            options_names.append( [ "SAVE (Commit the Changes)", "Press Esc to discard them" ] )
+            options_desciptions.append( SettingRecord( description="Select this option to save all the changed settings at once, or press Esc to discard them.\n" ) )
+
+        else:
+            options_names.append( [ "QUIT (Esc)", "End Edit Settings" ] )
+            options_desciptions.append( SettingRecord( description="You can press Esc, or select this option to end editing settings.\n" ) )
+
         options_paths.append( ["Filler", "To keep the same index as options_names"] )
-        options_desciptions.append( { "description": "You can press Esc, or select this option to end editing settings.\n" } )
 
         if setting_file is None:
             # log( 2, "run, self.setting_files.keys(): " + str( self.setting_files.keys() ) )
@@ -1093,9 +2712,9 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
             options_names.append( [ "BACK (Open the Main Menu)", "Choose another Setting to Edit" ] )
             options_paths.append( ["Filler", "To keep the same index as options_names"] )
-            options_desciptions.append( { "description": "Select this option to take another setting to edit.\n" } )
+            options_desciptions.append( SettingRecord( description="Select this option to take another setting to edit.\n" ) )
 
-            for setting_name in sorted(self.get_setting_names(setting_file)):
+            for setting_name in self.get_sorted_setting_names(setting_file):
                 # log( 2, 'run, setting_name: ' + str( setting_name ) )
 
                 option_path = [setting_file, setting_name]
@@ -1108,15 +2727,13 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
                 option_name = setting_file + '/' + setting_name
 
                 # log( 2, 'run, option_name: ' + str( option_name ) )
-                options_names.append( [ option_name, json.dumps( userValueAndDescription.get('value') ) ] )
+                options_names.append( [ option_name, get_option_value(setting_file, setting_name, userValueAndDescription.value) ] )
 
                 defaultValueAndDescription = self.getDefaultValueAndDescription(setting_file, setting_name)
                 # log( 4, "run, defaultValueAndDescription: ", json.dumps( defaultValueAndDescription, indent=4 ) )
 
                 options_desciptions.append( defaultValueAndDescription )
 
-        self.help_view = HelperView(self.window, "preferences_editor_help", self.view.settings().get('always_show_helper_view', False))
-
         # Always create the main dictionary entry as it is only one key
         if not has_index(main_function_key):
             save_index(main_function_key, 0)
@@ -1125,34 +2742,31 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
 
         def on_highlighted(index):
             # log( 8, "run, on_highlighted, index: " + str( index ) )
-            self.help_view.run_command("select_all")
 
             if index < len( options_desciptions ):
                 # log( 8, "run, on_highlighted, index: " + str( options_desciptions[index] ) )
-                self.help_view.run_command("insert", {"characters": options_desciptions[index]['description']})
+                self.help_view.set_text(get_setting_description(options_desciptions[index]))
 
             else:
-                self.help_view.run_command("insert", {"characters": "Package Settings"})
-
-            self.help_view.focus_begining()
+                self.help_view.set_text("Package Settings")
 
         def done(index):
             # log( 8, "run, done, index:              " + str( index ) )
             # log( 8, "run, done, self.is_main_panel: " + str( self.is_main_panel ) )
 
             if index < 0:
-                return self.shutdown()
+                return self.cancel()
 
             elif index == 0:
+                self.commit()
                 self.shutdown()
 
             elif index == 1 and not self.is_main_panel:
-                self.shutdown()
-                self.window.run_command(command_name)
+                self.open_panel()
 
             elif self.is_main_panel:
                 save_index(main_function_key, index)
-                self.window.run_command(command_name, {"setting_file": options_names[index][0]})
+                self.open_panel(options_names[index][0])
 
             else:
                 save_index(options_paths[index][0], index)
@@ -1174,6 +2788,94 @@ class QuickSettingsEditPreferencesCommand(sublime_plugin.WindowCommand):
             position = lambda: get_index(self.setting_file)
 
         self.options_names = options_names
+        self.options_paths = options_paths
         self.preferences_selector = lambda: show_quick_panel(self.view, self.options_names, done, on_highlighted, position)
-        self.preferences_selector()
+
+        g_performance_stats.add( "panel build", time.perf_counter() - panel_start )
+
+        # Only open the widget of the setting given to `run()` on the first panel of the session
+        open_setting_name, self.open_setting_name = self.open_setting_name, None
+
+        if open_setting_name and [self.setting_file, open_setting_name] in options_paths:
+            index = options_paths.index( [self.setting_file, open_setting_name] )
+            save_index(options_paths[index][0], index)
+
+            self.index = index
+            self.change_value(options_paths, index)
+
+        else:
+            self.preferences_selector()
+
+
+class QuickSettingsShowPerformanceStatsCommand(sublime_plugin.WindowCommand):
+
+    def run(self):
+        panel_name = "quick_settings_performance_stats"
+        stats_view = self.window.create_output_panel(panel_name)
+
+        stats_view.run_command("quick_settings_replace_help_view", {"characters": g_performance_stats.format_summary()})
+        self.window.run_command("show_panel", {"panel": "output."+panel_name})
+
+
+class QuickSettingsProfileNextSessionCommand(sublime_plugin.WindowCommand):
+    """
+        Open the Quick Settings panel profiling everything done until it is closed, including the
+        widgets, then write the profile to `Packages/User`.
+    """
+
+    def run(self):
+        global g_is_profiler_armed
+
+        try:
+            import cProfile
+
+        except ImportError:
+            sublime.error_message("Quick Settings: The cProfile module is not available on this Sublime Text.")
+            return
+
+        g_is_profiler_armed = True
+        self.window.run_command(command_name)
+
+
+class QuickSettingsSearchAllSettingsCommand(sublime_plugin.WindowCommand):
+
+    def run(self, query=None):
+        r"""
+        :param query:
+            Words to search for on the settings names and descriptions. If not given, the user
+            is asked for them.
+        """
+
+        if query is None:
+            self.window.show_input_panel( "Search All Settings:", "", self.search, None, None )
+
+        else:
+            self.search( query )
+
+    def search(self, query):
+        sublime.status_message( "Searching all settings..." )
+        sublime.set_timeout_async( lambda: self.search_async( query ), 0 )
+
+    def search_async(self, query):
+        results = get_search_index().search( query )
+        sublime.set_timeout( lambda: self.show_results( query, results ), 0 )
+
+    def show_results(self, query, results):
+
+        if not results:
+            sublime.status_message( "No settings found for: %s" % query )
+            return
+
+        options = [ [ setting_file + '/' + setting_name, description.strip().split( '\n' )[0] ]
+                for setting_file, setting_name, description in results ]
+
+        def done(index):
+
+            if index < 0:
+                return
+
+            setting_file, setting_name, description = results[index]
+            self.window.run_command( command_name, {"setting_file": setting_file, "setting_name": setting_name} )
+
+        show_quick_panel( self.window.active_view(), options, done )
 
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+import re
+import sys
+
+from json.decoder import scanstring
+
+
+# Single pass parser for the `*.sublime-settings` files, i.e., JSON with `//` and `/* */` comments
+# and trailing commas. It parses the values and extracts the comments attached to the top level keys
+# at the same time, and all its regular expressions match in linear time.
+
+# Interned, so the descriptions loaded from the preferences index share it
+NO_HELP_AVAILABLE = sys.intern( "No help available" )
+
+# Whitespace and comments between the tokens of nested values
+SKIP_RE = re.compile( r'(?:[ \t\r\n]|//[^\n]*|/\*.*?\*/)*', re.S )
+
+WHITESPACE_RE = re.compile( r'[ \t\r\n]*' )
+NUMBER_RE     = re.compile( r'-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?' )
+COMMENT_RE    = re.compile( r'//[^\n]*|/\*.*?\*/', re.S )
+INDENT_RE     = re.compile( r'[ \t]*' )
+
+LITERALS = \
+(
+    ( "true", True ),
+    ( "false", False ),
+    ( "null", None ),
+)
+
+
+def parse_settings(data, lazy_descriptions=False):
+    """
+        @data                string containing a `*.sublime-settings` file
+        @lazy_descriptions   if True, the description is the `[start, end]` position of the comments
+                             on `data`, to be formatted later with `format_description()`
+
+        @return a dictionary with the `[value, description]` pair of each top level setting
+
+        @raise ValueError when the data is not a valid settings file
+    """
+    settings = {}
+
+    for setting_name, setting_value, comment_span in iterate_settings(data):
+
+        if lazy_descriptions and comment_span:
+            settings[setting_name] = [setting_value, list( comment_span )]
+
+        else:
+            settings[setting_name] = [setting_value, format_description(data, comment_span)]
+
+    return settings
+
+
+def iterate_settings(data):
+    """
+        Yield a `(setting_name, setting_value, comment_span)` tuple for each top level setting, where
+        `comment_span` is the `(start, end)` position of the comments right above the setting on
+        `data`, or None when there are no comments.
+
+        A blank line between the comments and the setting detaches them, as well as comments on
+        the same line of the previous value, and comments inside nested values are ignored.
+    """
+    position = 1 if data.startswith( '\ufeff' ) else 0
+    position = SKIP_RE.match( data, position ).end()
+
+    if not data.startswith( '{', position ):
+        raise _error( "Expecting '{'", data, position )
+
+    position, comments = _skip_comments( data, position + 1, [] )
+
+    while not data.startswith( '}', position ):
+
+        if not data.startswith( '"', position ):
+            raise _error( "Expecting property name enclosed in double quotes", data, position )
+
+        setting_name, position = scanstring( data, position + 1, False )
+        position = SKIP_RE.match( data, position ).end()
+
+        if not data.startswith( ':', position ):
+            raise _error( "Expecting ':' delimiter", data, position )
+
+        position = SKIP_RE.match( data, position + 1 ).end()
+        setting_value, position = _parse_value( data, position )
+
+        yield setting_name, setting_value, comments and ( comments[0][0], comments[-1][1] ) or None
+        position, comments = _skip_comments( data, position, [] )
+
+        if data.startswith( ',', position ):
+            position, comments = _skip_comments( data, position + 1, comments )
+
+        elif not data.startswith( '}', position ):
+            raise _error( "Expecting ',' delimiter", data, position )
+
+    position = SKIP_RE.match( data, position + 1 ).end()
+
+    if position != len( data ):
+        raise _error( "Extra data", data, position )
+
+
+def format_description(data, comment_span):
+    """
+        @data           the settings file contents
+        @comment_span   the `(start, end)` position of the comments as yielded by `iterate_settings()`
+
+        @return the text of the comments without the comment markers and the common indentation
+    """
+
+    if not comment_span:
+        return NO_HELP_AVAILABLE
+
+    comment = []
+
+    for match in COMMENT_RE.finditer( data, *comment_span ):
+        text = match.group()
+
+        if text.startswith( '//' ):
+            text = text[2:].rstrip( '\r' )
+
+            if text[:1] in ( ' ', '\t' ):
+                text = text[1:]
+
+            comment.append( text + "\n" )
+
+        else:
+            lines = text[2:-2].split( '\n' )
+
+            if len( lines ) == 1:
+                comment.append( lines[0].rstrip() + "\n" )
+
+            else:
+                comment.append( lines[0].rstrip() + "\n" )
+                comment.extend( line + "\n" for line in lines[1:-1] )
+                comment.append( lines[-1].rstrip() + "\n" )
+
+    comment = "".join( comment ).lstrip( '\n' ).replace( '\r', '' )
+    indent = INDENT_RE.match( comment ).group()
+
+    if indent:
+        comment = ''.join( [ line[len( indent ):] if line.startswith( indent ) else line
+                for line in comment.splitlines( True ) ] )
+
+    return comment or NO_HELP_AVAILABLE
+
+
+def _skip_comments(data, position, comments):
+    """
+        Skip the whitespace and comments between two top level settings.
+
+        @return the position of the next token and the spans of the comments which are candidates
+                to describe the next setting
+    """
+    is_trailing = True
+
+    while True:
+        whitespace_end = WHITESPACE_RE.match( data, position ).end()
+        new_lines = data.count( '\n', position, whitespace_end )
+
+        if new_lines:
+            is_trailing = False
+
+            # An empty line resets the current comment
+            if new_lines > 1:
+                comments = []
+
+        position = whitespace_end
+
+        if data.startswith( '//', position ):
+            comment_end = data.find( '\n', position )
+
+            if comment_end < 0:
+                comment_end = len( data )
+
+        elif data.startswith( '/*', position ):
+            comment_end = data.find( '*/', position + 2 )
+
+            if comment_end < 0:
+                raise _error( "Unterminated comment", data, position )
+
+            comment_end += 2
+
+        else:
+            return position, comments
+
+        if not is_trailing:
+            comments.append( ( position, comment_end ) )
+
+        position = comment_end
+
+
+def _parse_value(data, position):
+    """
+        @return the value starting at `position` and the position right after it
+    """
+    first = data[position:position + 1]
+
+    if first == '"':
+        return scanstring( data, position + 1, False )
+
+    if first == '{':
+        value = {}
+        position = SKIP_RE.match( data, position + 1 ).end()
+
+        while not data.startswith( '}', position ):
+
+            if not data.startswith( '"', position ):
+                raise _error( "Expecting property name enclosed in double quotes", data, position )
+
+            key, position = scanstring( data, position + 1, False )
+            position = SKIP_RE.match( data, position ).end()
+
+            if not data.startswith( ':', position ):
+                raise _error( "Expecting ':' delimiter", data, position )
+
+            position = SKIP_RE.match( data, position + 1 ).end()
+            value[key], position = _parse_value( data, position )
+            position = SKIP_RE.match( data, position ).end()
+
+            if data.startswith( ',', position ):
+                position = SKIP_RE.match( data, position + 1 ).end()
+
+            elif not data.startswith( '}', position ):
+                raise _error( "Expecting ',' delimiter", data, position )
+
+        return value, position + 1
+
+    if first == '[':
+        value = []
+        position = SKIP_RE.match( data, position + 1 ).end()
+
+        while not data.startswith( ']', position ):
+            item, position = _parse_value( data, position )
+
+            value.append( item )
+            position = SKIP_RE.match( data, position ).end()
+
+            if data.startswith( ',', position ):
+                position = SKIP_RE.match( data, position + 1 ).end()
+
+            elif not data.startswith( ']', position ):
+                raise _error( "Expecting ',' delimiter", data, position )
+
+        return value, position + 1
+
+    match = NUMBER_RE.match( data, position )
+
+    if match:
+        number = match.group()
+
+        if match.group( 1 ) or match.group( 2 ):
+            return float( number ), match.end()
+
+        return int( number ), match.end()
+
+    for literal, value in LITERALS:
+
+        if data.startswith( literal, position ):
+            return value, position + len( literal )
+
+    raise _error( "Expecting value", data, position )
+
+
+def _error(message, data, position):
+    line = data.count( '\n', 0, position ) + 1
+    column = position - data.rfind( '\n', 0, position )
+    return ValueError( "%s: line %d column %d (char %d)" % ( message, line, column, position ) )
+